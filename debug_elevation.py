@@ -1,74 +1,153 @@
 #!/usr/bin/env python3
 
-import gpxpy
+import hashlib
+import math
+import pickle
 import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import filterfalse
 from pathlib import Path
 
-def debug_elevation_scaling(original_file, scaled_file):
-    """Debug elevation scaling by comparing original and scaled files."""
+from gpxscaler import CACHE_DIR, elevation_profile_stats, iter_track_elevations
+
+def format_elevations(elevations):
+    """Format elevations as a bracketed, comma-separated list to 0.1m."""
+    return "[" + ", ".join(map("{:.1f}".format, elevations)) + "]"
+
+def _analyze_file(filename):
+    """Collect elevations and ascent/descent/extreme statistics for a GPX file."""
+    # Contiguous doubles rather than a list of boxed floats
+    elevations = array('d')
+    ascent = 0
+    descent = 0
+    min_elev = float('inf')
+    max_elev = float('-inf')
+
+    # One fused pass per segment yields the changes and extremes; the
+    # threshold totals are not reported here, so no threshold is applied
+    for segment_elevations in iter_track_elevations(filename, missing=math.nan):
+        elevations.extend(filterfalse(math.isnan, segment_elevations))
+        (segment_ascent, segment_descent, _, _,
+         segment_min, segment_max) = elevation_profile_stats(segment_elevations, math.inf)
+        ascent += segment_ascent
+        descent += segment_descent
+        min_elev = min(min_elev, segment_min)
+        max_elev = max(max_elev, segment_max)
+
+    return {
+        'elevations': elevations,
+        'ascent': ascent,
+        'descent': descent,
+        'min_elev': min_elev if elevations else 0,
+        'max_elev': max_elev if elevations else 0,
+        'first_elev': elevations[0] if elevations else None,
+        'last_elev': elevations[-1] if elevations else None
+    }
+
+def _cache_location(filename):
+    """Return (path, path key, cache file) for a GPX file's cached analysis."""
+    path = Path(filename).resolve()
+    stat = path.stat()
+    path_key = hashlib.sha1(str(path).encode('utf-8')).hexdigest()
+    return path, path_key, CACHE_DIR / f"{path_key}_{stat.st_mtime_ns}_{stat.st_size}.pkl"
+
+def load_cached_analysis(filename):
+    """Return the cached analysis of an unchanged file, or None on a miss."""
+    try:
+        _, _, cache_file = _cache_location(filename)
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None  # Missing file or cache entry, or unreadable cache
+
+def analyze_file(filename):
+    """
+    Analyze a GPX file, reusing a cached result while the file is unchanged.
+
+    Results are pickled under CACHE_DIR keyed on the resolved path, mtime and
+    size, so re-running the debug comparison on the same files skips parsing.
+    """
+    cached = load_cached_analysis(filename)
+    if cached is not None:
+        return cached
+
+    path, path_key, cache_file = _cache_location(filename)
+    data = _analyze_file(path)
 
-    def analyze_file(filename):
-        with open(filename, 'r', encoding='utf-8') as f:
-            gpx = gpxpy.parse(f)
-
-        elevations = []
-        ascent = 0
-        descent = 0
-
-        for track in gpx.tracks:
-            for segment in track.segments:
-                points = segment.points
-                for i, point in enumerate(points):
-                    if point.elevation is not None:
-                        elevations.append(point.elevation)
-
-                        if i > 0 and points[i-1].elevation is not None:
-                            elev_change = point.elevation - points[i-1].elevation
-                            if elev_change > 0:
-                                ascent += elev_change
-                            else:
-                                descent += abs(elev_change)
-
-        return {
-            'elevations': elevations,
-            'ascent': ascent,
-            'descent': descent,
-            'min_elev': min(elevations) if elevations else 0,
-            'max_elev': max(elevations) if elevations else 0,
-            'first_elev': elevations[0] if elevations else None,
-            'last_elev': elevations[-1] if elevations else None
-        }
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Drop entries for older versions of the same file
+        for stale_file in CACHE_DIR.glob(f"{path_key}_*.pkl"):
+            stale_file.unlink()
+        with open(cache_file, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        pass  # Caching is best-effort only
+
+    return data
+
+def format_elevation_samples(title, original, scaled):
+    """Render original and scaled elevation samples with their per-point delta."""
+    deltas = [s - o for o, s in zip(original, scaled)]
+    return (f"\n{title}:\n"
+            f"  Original: {format_elevations(original)}\n"
+            f"  Scaled:   {format_elevations(scaled)}\n"
+            f"  Delta:    {format_elevations(deltas)}")
+
+FILE_REPORT_TEMPLATE = """{label} FILE: {name}
+  First elevation: {first_elev:.1f}m
+  Last elevation:  {last_elev:.1f}m
+  Min elevation:   {min_elev:.1f}m
+  Max elevation:   {max_elev:.1f}m
+  Elevation range: {elev_range:.1f}m
+  Total ascent:    {ascent:.1f}m
+  Total descent:   {descent:.1f}m
+  Data points:     {point_count}"""
+
+def format_file_report(label, filename, data):
+    """Render the per-file summary block in one formatting pass."""
+    return FILE_REPORT_TEMPLATE.format_map({
+        **data,
+        'label': label,
+        'name': Path(filename).name,
+        'elev_range': data['max_elev'] - data['min_elev'],
+        'point_count': len(data['elevations'])
+    })
 
+def debug_elevation_scaling(original_file, scaled_file):
+    """Debug elevation scaling by comparing original and scaled files."""
     print("ELEVATION SCALING DEBUG")
     print("=" * 50)
 
+    # Cache hits are read here; worker processes only pay off when both
+    # files actually need parsing, and then the two are parsed in parallel
+    cached = {filename: load_cached_analysis(filename)
+              for filename in (original_file, scaled_file)}
+    futures = {}
+    if cached[original_file] is None and cached[scaled_file] is None:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            futures = {filename: executor.submit(analyze_file, filename)
+                       for filename in (original_file, scaled_file)}
+
+    def file_data(filename):
+        if filename in futures:
+            return futures[filename].result()
+        if cached[filename] is not None:
+            return cached[filename]
+        return analyze_file(filename)
+
     try:
-        orig_data = analyze_file(original_file)
-        print(f"ORIGINAL FILE: {Path(original_file).name}")
-        print(f"  First elevation: {orig_data['first_elev']:.1f}m")
-        print(f"  Last elevation:  {orig_data['last_elev']:.1f}m")
-        print(f"  Min elevation:   {orig_data['min_elev']:.1f}m")
-        print(f"  Max elevation:   {orig_data['max_elev']:.1f}m")
-        print(f"  Elevation range: {orig_data['max_elev'] - orig_data['min_elev']:.1f}m")
-        print(f"  Total ascent:    {orig_data['ascent']:.1f}m")
-        print(f"  Total descent:   {orig_data['descent']:.1f}m")
-        print(f"  Data points:     {len(orig_data['elevations'])}")
+        orig_data = file_data(original_file)
+        print(format_file_report("ORIGINAL", original_file, orig_data))
 
     except Exception as e:
         print(f"Error analyzing original file: {e}")
         return
 
     try:
-        scaled_data = analyze_file(scaled_file)
-        print(f"\nSCALED FILE: {Path(scaled_file).name}")
-        print(f"  First elevation: {scaled_data['first_elev']:.1f}m")
-        print(f"  Last elevation:  {scaled_data['last_elev']:.1f}m")
-        print(f"  Min elevation:   {scaled_data['min_elev']:.1f}m")
-        print(f"  Max elevation:   {scaled_data['max_elev']:.1f}m")
-        print(f"  Elevation range: {scaled_data['max_elev'] - scaled_data['min_elev']:.1f}m")
-        print(f"  Total ascent:    {scaled_data['ascent']:.1f}m")
-        print(f"  Total descent:   {scaled_data['descent']:.1f}m")
-        print(f"  Data points:     {len(scaled_data['elevations'])}")
+        scaled_data = file_data(scaled_file)
+        print("\n" + format_file_report("SCALED", scaled_file, scaled_data))
 
         print(f"\nSCALING RATIOS:")
         if orig_data['ascent'] > 0:
@@ -87,14 +166,14 @@ def debug_elevation_scaling(original_file, scaled_file):
         print(f"  Scaled range:    {scaled_range:.1f}m")
 
         # Sample first 10 and last 10 elevations for comparison
-        print(f"\nFIRST 10 ELEVATIONS:")
-        print(f"  Original: {[f'{e:.1f}' for e in orig_data['elevations'][:10]]}")
-        print(f"  Scaled:   {[f'{e:.1f}' for e in scaled_data['elevations'][:10]]}")
+        print(format_elevation_samples("FIRST 10 ELEVATIONS",
+                                       orig_data['elevations'][:10],
+                                       scaled_data['elevations'][:10]))
 
         if len(orig_data['elevations']) > 10:
-            print(f"\nLAST 10 ELEVATIONS:")
-            print(f"  Original: {[f'{e:.1f}' for e in orig_data['elevations'][-10:]]}")
-            print(f"  Scaled:   {[f'{e:.1f}' for e in scaled_data['elevations'][-10:]]}")
+            print(format_elevation_samples("LAST 10 ELEVATIONS",
+                                           orig_data['elevations'][-10:],
+                                           scaled_data['elevations'][-10:]))
 
     except Exception as e:
         print(f"Error analyzing scaled file: {e}")
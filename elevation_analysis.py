@@ -1,15 +1,44 @@
 #!/usr/bin/env python3
 
-import gpxpy
+import math
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import filterfalse, repeat
 from pathlib import Path
 
+import gpxpy.geo
+
+from gpxscaler import elevation_profile_stats, iter_track_elevations
+
+# Worker start-up only pays off once there is this much work to share out
+PARALLEL_MIN_POINTS = 200000
+
+def summarize_segment(elevations, threshold):
+    """Compute every elevation statistic for one track segment."""
+    known_elevations = list(filterfalse(math.isnan, elevations))
+
+    # gpxpy's get_uphill_downhill result, computed on the same list
+    gpxpy_ascent, gpxpy_descent = gpxpy.geo.calculate_uphill_downhill(known_elevations)
+
+    # Raw, threshold-based and extreme values share one pass
+    (raw_ascent, raw_descent, threshold_ascent, threshold_descent,
+     min_elev, max_elev) = elevation_profile_stats(elevations, threshold)
+
+    return {
+        'point_count': len(known_elevations),
+        'min_elev': min_elev,
+        'max_elev': max_elev,
+        'raw_ascent': raw_ascent,
+        'raw_descent': raw_descent,
+        'threshold_ascent': threshold_ascent,
+        'threshold_descent': threshold_descent,
+        'gpxpy_ascent': gpxpy_ascent,
+        'gpxpy_descent': gpxpy_descent
+    }
+
 def analyze_elevation_detailed(filename):
     """Analyze elevation with different methods to match fitness platforms."""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            gpx = gpxpy.parse(f)
-
         print(f"\nDetailed elevation analysis for: {Path(filename).name}")
         print("=" * 60)
 
@@ -26,64 +55,42 @@ def analyze_elevation_detailed(filename):
         gpxpy_ascent = 0
         gpxpy_descent = 0
 
-        all_elevations = []
-
-        for track in gpx.tracks:
-            for segment in track.segments:
-                if len(segment.points) < 2:
-                    continue
-
-                # Get gpxpy's calculation
-                uphill, downhill = segment.get_uphill_downhill()
-                if uphill:
-                    gpxpy_ascent += uphill
-                if downhill:
-                    gpxpy_descent += downhill
-
-                # Manual calculations
-                points = segment.points
-                for i in range(len(points)):
-                    if points[i].elevation is not None:
-                        all_elevations.append(points[i].elevation)
-
-                # Raw calculation
-                for i in range(1, len(points)):
-                    if (points[i-1].elevation is not None and
-                            points[i].elevation is not None):
-                        elevation_change = points[i].elevation - points[i-1].elevation
-                        if elevation_change > 0:
-                            raw_ascent += elevation_change
-                        else:
-                            raw_descent += abs(elevation_change)
-
-                # Threshold-based calculation (accumulate small changes)
-                accumulated_gain = 0
-                accumulated_loss = 0
-                for i in range(1, len(points)):
-                    if (points[i-1].elevation is not None and
-                            points[i].elevation is not None):
-                        elevation_change = points[i].elevation - points[i-1].elevation
-                        if elevation_change > 0:
-                            accumulated_gain += elevation_change
-                            if accumulated_gain >= min_elevation_change:
-                                threshold_ascent += accumulated_gain
-                                accumulated_gain = 0
-                        else:
-                            accumulated_loss += abs(elevation_change)
-                            if accumulated_loss >= min_elevation_change:
-                                threshold_descent += accumulated_loss
-                                accumulated_loss = 0
+        # Segments are independent, so large multi-segment files are
+        # summarized in worker processes and reduced afterwards
+        segments = [elevations for elevations in
+                    iter_track_elevations(filename, missing=math.nan)
+                    if len(elevations) >= 2]
+        if (len(segments) > 1 and
+                sum(map(len, segments)) >= PARALLEL_MIN_POINTS):
+            with ProcessPoolExecutor() as executor:
+                summaries = list(executor.map(
+                    summarize_segment, segments, repeat(min_elevation_change)))
+        else:
+            summaries = [summarize_segment(elevations, min_elevation_change)
+                         for elevations in segments]
+
+        point_count = 0
+        min_elev = math.inf
+        max_elev = -math.inf
+        for summary in summaries:
+            point_count += summary['point_count']
+            min_elev = min(min_elev, summary['min_elev'])
+            max_elev = max(max_elev, summary['max_elev'])
+            raw_ascent += summary['raw_ascent']
+            raw_descent += summary['raw_descent']
+            threshold_ascent += summary['threshold_ascent']
+            threshold_descent += summary['threshold_descent']
+            gpxpy_ascent += summary['gpxpy_ascent']
+            gpxpy_descent += summary['gpxpy_descent']
 
         # Statistics
-        if all_elevations:
-            min_elev = min(all_elevations)
-            max_elev = max(all_elevations)
+        if point_count:
             elevation_range = max_elev - min_elev
         else:
             min_elev = max_elev = elevation_range = 0
 
         print(f"Elevation range: {min_elev:.1f}m to {max_elev:.1f}m (range: {elevation_range:.1f}m)")
-        print(f"Total data points: {len(all_elevations)}")
+        print(f"Total data points: {point_count}")
         print()
         print("ASCENT CALCULATIONS:")
         print(f"  Raw point-to-point:     {raw_ascent:.1f}m")
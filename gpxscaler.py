@@ -6,25 +6,420 @@ GPXScaler - A tool to scale GPX routes in distance and elevation with coordinate
 import os
 import sys
 import argparse
+import functools
 import glob
 import math
 import re
+import shutil
 import requests
 import subprocess
 import json
+import operator
+import pickle
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 import gpxpy
+import gpxpy.geo
 import gpxpy.gpx
+import gpxpy.gpxfield
+import gpxpy.utils
+
+try:
+    import orjson  # Optional faster JSON decoding for API responses
+except ImportError:
+    orjson = None
+
+# Per-user cache for results that are expensive to recompute or fetch
+CACHE_DIR = Path.home() / ".cache" / "gpx-scaler"
+ELEVATION_CACHE_FILE = CACHE_DIR / "elevation_cache.json"
+ROUTE_STATS_CACHE_FILE = CACHE_DIR / "route_stats.pkl"
+
+# Open-Elevation lookup: GET with ?locations=lat,lon or POST a batch of locations
+OPEN_ELEVATION_LOOKUP_URL = "https://api.open-elevation.com/api/v1/lookup"
+
+# Free elevation services queried together: (name, URL template, response parser)
+ELEVATION_ENDPOINTS = [
+    ("Open-Elevation API",
+     OPEN_ELEVATION_LOOKUP_URL + "?locations={lat},{lon}",
+     lambda data: (data.get('results') or [{}])[0].get('elevation')),
+    ("elevation-api.io",
+     "https://elevation-api.io/api/elevation?points=({lat},{lon})",
+     lambda data: (data.get('elevations') or [{}])[0].get('elevation')),
+]
+
+# IP geolocation services queried together, parsers return (lat, lon) or None
+LOCATION_ENDPOINTS = [
+    ("ipapi.co", "http://ipapi.co/json/",
+     lambda data: ((data['latitude'], data['longitude'])
+                   if data.get('latitude') is not None else None)),
+    ("ip-api.com", "http://ip-api.com/json/",
+     lambda data: ((data.get('lat'), data.get('lon'))
+                   if data.get('status') == 'success' else None)),
+]
+
+# Predefined flat, Garmin-compatible start coordinates (--terrain N picks entry N)
+FLAT_TERRAIN_LOCATIONS = (
+    {
+        'name': 'North Sea (Garmin-compatible offshore)',
+        'lat': 54.0,
+        'lon': 3.0,
+        'description': 'Offshore North Sea - flat water, Garmin-compatible coordinates'
+    },
+    {
+        'name': 'English Channel (moderate offshore)',
+        'lat': 50.5,
+        'lon': 0.0,
+        'description': 'English Channel - flat water, commonly used coordinates'
+    },
+    {
+        'name': 'Mediterranean Sea (stable coordinates)',
+        'lat': 40.0,
+        'lon': 15.0,
+        'description': 'Mediterranean Sea - flat, stable coordinates for Garmin'
+    },
+    {
+        'name': 'Baltic Sea (conservative offshore)',
+        'lat': 58.0,
+        'lon': 18.0,
+        'description': 'Baltic Sea - flat water, conservative European coordinates'
+    },
+    {
+        'name': 'Bay of Biscay (Atlantic offshore)',
+        'lat': 45.0,
+        'lon': -5.0,
+        'description': 'Bay of Biscay - flat Atlantic area, moderate coordinates'
+    },
+    {
+        'name': 'Netherlands Coast (minimal elevation)',
+        'lat': 52.5,
+        'lon': 4.0,
+        'description': 'Just off Netherlands coast - very flat, Garmin-friendly'
+    },
+    {
+        'name': 'Remote Pacific Ocean (anti-Garmin elevation)',
+        'lat': 0.0,
+        'lon': 180.0,
+        'description': 'International Date Line - for testing only, may cause import issues'
+    }
+)
+
+# The same locations by their 1-based menu/--terrain number
+FLAT_TERRAIN_BY_NUMBER = dict(enumerate(FLAT_TERRAIN_LOCATIONS, 1))
+
+# Steps shorter than this (radians, |dlat| + |dlon|, up to ~6km) use the
+# equirectangular distance; measured against Haversine the difference is
+# at most 0.02mm at the equator and 0.12mm at any latitude up to the poles
+EQUIRECTANGULAR_MAX_STEP = 0.001
+
+# Scaled steps shorter than this (radians, ~32m) are walked on the local
+# tangent plane. Unlike the distance shortcut the error compounds from step
+# to step and grows with the square of the scaled step, so this is much
+# tighter: a 5000-step, 150km straight line at 70N drifts about 1m from the
+# spherical walk, and 800-point stage tracks stay within a few centimeters
+TANGENT_PLANE_MAX_STEP = 5e-6
+
+
+def _response_json(response):
+    """Decode a requests response body as JSON, with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _output_file_size(path):
+    """Return the size of a converter's output file, or 0 if it was not created."""
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _remove_temp_file(path):
+    """Delete a temporary file if it exists; cleanup failures are ignored."""
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError:
+        pass  # Silently ignore cleanup errors
+
+
+def _xml_source(gpx_source):
+    """Return a path string or an open file object for ElementTree.iterparse."""
+    if hasattr(gpx_source, 'read'):
+        return gpx_source
+    return str(gpx_source)
+
+
+def _local_tag(element):
+    """Return an element's tag without its XML namespace."""
+    return element.tag.rpartition('}')[2]
+
+
+def _point_elevation(element, missing):
+    """Return the float <ele> of a trkpt/rtept element, or `missing` if absent."""
+    for child in element:
+        if _local_tag(child) == 'ele' and child.text and child.text.strip():
+            return float(child.text)
+    return missing
+
+
+def iter_track_elevations(gpx_path, missing=None):
+    """
+    Stream a GPX file and yield the elevations of each track segment.
+
+    Uses ElementTree.iterparse so only one segment is held in memory at a time,
+    instead of building the full gpxpy object tree. Points without an <ele>
+    are yielded as `missing` (None by default, matching gpxpy's
+    point.elevation; pass math.nan to get plain floats throughout).
+    """
+    elevations = []
+    for _, element in ET.iterparse(_xml_source(gpx_path), events=('end',)):
+        tag = _local_tag(element)
+        if tag == 'trkpt':
+            elevations.append(_point_elevation(element, missing))
+            element.clear()
+        elif tag == 'trkseg':
+            yield elevations
+            elevations = []
+            element.clear()
+
+
+def iter_gpx_segments(gpx_path, missing=None):
+    """
+    Stream a GPX file and yield (kind, latitudes, longitudes, elevations).
+
+    kind is 'track' for each track segment and 'route' for each route, in
+    file order. Like iter_track_elevations, only one segment is held in
+    memory and missing elevations are yielded as `missing`. gpx_path may
+    also be an open file object.
+    """
+    latitudes = []
+    longitudes = []
+    elevations = []
+    for _, element in ET.iterparse(_xml_source(gpx_path), events=('end',)):
+        tag = _local_tag(element)
+        if tag == 'trkpt' or tag == 'rtept':
+            latitudes.append(float(element.get('lat')))
+            longitudes.append(float(element.get('lon')))
+            elevations.append(_point_elevation(element, missing))
+            element.clear()
+        elif tag == 'trkseg' or tag == 'rte':
+            yield ('track' if tag == 'trkseg' else 'route'), latitudes, longitudes, elevations
+            latitudes = []
+            longitudes = []
+            elevations = []
+            element.clear()
+
+
+def count_gpx_points(gpx_path):
+    """
+    Count the trkpt and rtept elements of a GPX file by streaming it.
+
+    Only tag names are inspected, so no coordinates or elevations are
+    converted, and every element is cleared once it has been seen.
+    """
+    point_count = 0
+    for _, element in ET.iterparse(_xml_source(gpx_path), events=('end',)):
+        tag = _local_tag(element)
+        if tag == 'trkpt' or tag == 'rtept':
+            point_count += 1
+        element.clear()
+    return point_count
+
+
+# Point fields other than lat/lon/ele/time, and their values on a bare point;
+# points matching these can be written without going through gpxpy's serializer
+_POINT_EXTRA_FIELDS = operator.attrgetter(*[
+    field.name for field in gpxpy.gpx.GPXTrackPoint.gpx_11_fields
+    if not isinstance(field, str) and
+    field.name not in ('latitude', 'longitude', 'elevation', 'time')])
+_BARE_POINT_EXTRAS = _POINT_EXTRA_FIELDS(gpxpy.gpx.GPXTrackPoint())
+
+
+def _iter_points_xml(points, tag, indent, nsmap):
+    """Serialize trkpt/rtept elements one by one, exactly as gpxpy's to_xml() would."""
+    make_str = gpxpy.utils.make_str
+    format_time = gpxpy.gpxfield.format_time
+    child_indent = indent + '  '
+    for point in points:
+        if _POINT_EXTRA_FIELDS(point) != _BARE_POINT_EXTRAS:
+            yield gpxpy.gpxfield.gpx_fields_to_xml(point, tag, '1.1', nsmap=nsmap,
+                                                   indent=indent)
+            continue
+        elevation = ('' if point.elevation is None else
+                     f'\n{child_indent}<ele>{make_str(point.elevation)}</ele>')
+        time = ('' if point.time is None else
+                f'\n{child_indent}<time>{format_time(point.time)}</time>')
+        yield (f'\n{indent}<{tag} lat="{make_str(point.latitude)}" '
+               f'lon="{make_str(point.longitude)}">{elevation}{time}\n{indent}</{tag}>')
+
+
+def _without_points_to_xml(item, attribute, tag, indent, nsmap):
+    """Serialize a track/route with its point list temporarily emptied."""
+    children = getattr(item, attribute)
+    setattr(item, attribute, [])
+    try:
+        content = gpxpy.gpxfield.gpx_fields_to_xml(item, tag, '1.1', nsmap=nsmap,
+                                                   indent=indent)
+    finally:
+        setattr(item, attribute, children)
+    closing = f'\n{indent}</{tag}>'
+    return content[:-len(closing)], closing
+
+
+def iter_gpx_xml(gpx):
+    """
+    Serialize a GPX object in chunks that join to the same string as gpx.to_xml().
+
+    gpxpy walks every field of every point through its generic serializer,
+    which dominates write time for long tracks. Here gpxpy still writes the
+    document, track and route headers, but points that only carry
+    lat/lon/ele/time are formatted directly, one chunk per point, so the
+    document never has to be held in memory as a whole. Anything unusual
+    (GPX 1.0, top-level extensions, points with other fields) goes through
+    gpxpy.
+    """
+    if gpx.version == '1.0' or gpx.extensions:
+        yield gpx.to_xml()
+        return
+
+    tracks, routes = gpx.tracks, gpx.routes
+    gpx.tracks, gpx.routes = [], []
+    try:
+        document = gpx.to_xml()
+    finally:
+        gpx.tracks, gpx.routes = tracks, routes
+
+    head, closing, _ = document.rpartition('\n</gpx>')
+    yield head
+    for route in routes:
+        content, route_closing = _without_points_to_xml(route, 'points', 'rte', '  ', gpx.nsmap)
+        yield content
+        yield from _iter_points_xml(route.points, 'rtept', '    ', gpx.nsmap)
+        yield route_closing
+    for track in tracks:
+        content, track_closing = _without_points_to_xml(track, 'segments', 'trk', '  ', gpx.nsmap)
+        yield content
+        for segment in track.segments:
+            if segment.extensions:
+                yield gpxpy.gpxfield.gpx_fields_to_xml(segment, 'trkseg', '1.1',
+                                                       nsmap=gpx.nsmap, indent='    ')
+                continue
+            yield '\n    <trkseg>'
+            yield from _iter_points_xml(segment.points, 'trkpt', '      ', gpx.nsmap)
+            yield '\n    </trkseg>'
+        yield track_closing
+    yield closing
+
+
+def gpx_to_xml(gpx):
+    """Serialize a GPX object to the same string as gpx.to_xml()."""
+    return ''.join(iter_gpx_xml(gpx))
+
+
+def write_gpx(gpx, output_path):
+    """Stream a GPX object to output_path without building the document string."""
+    with open(output_path, 'w') as f:
+        f.writelines(iter_gpx_xml(gpx))
+
+
+def raw_uphill_downhill(elevations):
+    """
+    Sum the raw point-to-point elevation gains and losses in a single pass.
+
+    Steps where either elevation is None are skipped. Returns (ascent, descent).
+    """
+    ascent = descent = 0
+    prev = None
+    for cur in elevations:
+        if prev is not None and cur is not None:
+            change = cur - prev
+            if change > 0:
+                ascent += change
+            elif change < 0:
+                descent -= change
+        prev = cur
+    return ascent, descent
+
+
+def elevation_profile_stats(elevations, threshold):
+    """
+    Summarize one segment's elevations in a single pass.
+
+    Returns (raw_ascent, raw_descent, threshold_ascent, threshold_descent,
+    min_elev, max_elev). Threshold totals accumulate small changes and only
+    count them once they reach `threshold` meters, like Garmin's smoothing.
+    Missing elevations must be NaN (iter_track_elevations(missing=math.nan)):
+    they fail every comparison, so they never set an extreme and any change
+    touching one is skipped. Extremes stay at +/-inf if nothing is known.
+    """
+    raw_ascent = raw_descent = 0.0
+    threshold_ascent = threshold_descent = 0.0
+    accumulated_gain = accumulated_loss = 0.0
+    min_elev = math.inf
+    max_elev = -math.inf
+    prev = math.nan
+    for cur in elevations:
+        if cur < min_elev:
+            min_elev = cur
+        if cur > max_elev:
+            max_elev = cur
+        change = cur - prev
+        if change > 0:
+            raw_ascent += change
+            accumulated_gain += change
+            if accumulated_gain >= threshold:
+                threshold_ascent += accumulated_gain
+                accumulated_gain = 0.0
+        elif change < 0:
+            raw_descent -= change
+            accumulated_loss -= change
+            if accumulated_loss >= threshold:
+                threshold_descent += accumulated_loss
+                accumulated_loss = 0.0
+        prev = cur
+    return (raw_ascent, raw_descent, threshold_ascent, threshold_descent,
+            min_elev, max_elev)
+
 
 class GPXScaler:
+    STAGE_PATTERN = re.compile(r'stage-(\d+)', re.IGNORECASE)
+
     def __init__(self):
         self.gpx_files = []
         self.route_stats = {}
         self.config_file = Path("gpx_scaler_config.json")
+        self.config_cache = None
+        self.elevation_cache = None
+        self.route_stats_cache = None
+        # One session so repeated lookups reuse the HTTPS connection. A failed
+        # connection is retried once, but read timeouts are not: the services
+        # are already queried side by side, and waiting out the timeout again
+        # would only delay falling back to the others
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'GPXScaler/1.0'
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                              max_retries=Retry(total=1, connect=1, read=False))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.gpsbabel_path = None  # Looked up on first conversion; '' if missing
 
     def load_config(self):
-        """Load configuration from JSON file."""
+        """
+        Load configuration from JSON file.
+
+        The file is read once per instance; save_config keeps the cached copy
+        in step with what it writes. Callers get their own dict to modify.
+        """
+        if self.config_cache is None:
+            self.config_cache = self.read_config_file()
+        return dict(self.config_cache)
+
+    def read_config_file(self):
+        """Read the JSON configuration file, filling in defaults for missing keys."""
         default_config = {
             "scale": 0.5,
             "start_lat": 52.5,
@@ -101,11 +496,20 @@ class GPXScaler:
         return v
 
     # Move all helper methods into the class
-    def extract_stage_number(self, filename):
-        match = re.search(r'stage-(\d+)', filename.lower())
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def extract_stage_number(filename):
+        """
+        Return a (stage number, filename) sort key.
+
+        Files without a "stage-N" number get infinity so they sort after the
+        numbered stages, alphabetically among themselves. Keys are memoized per
+        filename, since the same files are sorted for analysis, preview and
+        scaling.
+        """
+        match = GPXScaler.STAGE_PATTERN.search(filename)
         if match:
-            return int(match.group(1))
-        # If no stage number found, return filename for alphabetical sort
+            return int(match.group(1)), filename
         return float('inf'), filename
 
     def save_config(self, scale=None, start_lat=None, start_lon=None,
@@ -134,6 +538,7 @@ class GPXScaler:
             config["max_ascent"] = max_ascent
         if ascent_scale is not None:
             config["ascent_scale"] = ascent_scale
+        self.config_cache = config
         try:
             with open(self.config_file, 'w') as f:
                 json.dump(config, f, indent=2)
@@ -147,7 +552,13 @@ class GPXScaler:
             print(f"Error: Folder '{folder_path}' does not exist.")
             return False
 
-        self.gpx_files = list(folder.glob("*.gpx"))
+        # scandir reports the entry type without an extra stat per file
+        with os.scandir(folder) as entries:
+            self.gpx_files = [Path(entry.path) for entry in entries
+                              if entry.is_file() and entry.name.lower().endswith('.gpx')]
+        # Put the files in stage order once; route_stats, the preview and the
+        # scaled output all follow this order without sorting again
+        self.gpx_files.sort(key=lambda gpx_file: self.extract_stage_number(gpx_file.name))
         if not self.gpx_files:
             print(f"No GPX files found in '{folder_path}'")
             return False
@@ -159,46 +570,120 @@ class GPXScaler:
 
     def calculate_distance(self, point1, point2):
         """Calculate distance between two GPS points using Haversine formula."""
-        R = 6371000  # Earth radius in meters
+        return self.calculate_coordinate_distance(point1.latitude, point1.longitude,
+                                                  point2.latitude, point2.longitude)
 
-        lat1, lon1 = math.radians(point1.latitude), math.radians(point1.longitude)
-        lat2, lon2 = math.radians(point2.latitude), math.radians(point2.longitude)
+    def calculate_coordinate_distance(self, lat1, lon1, lat2, lon2):
+        """Calculate Haversine distance (meters) between two lat/lon pairs in degrees."""
+        R = 6371000  # Earth radius in meters
+        sin, cos, radians = math.sin, math.cos, math.radians
 
+        lat1, lat2 = radians(lat1), radians(lat2)
         dlat = lat2 - lat1
-        dlon = lon2 - lon1
+        dlon = radians(lon2) - radians(lon1)
 
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+        # asin form: one sqrt and no atan2; a is clamped for antipodal rounding
+        c = 2 * math.asin(math.sqrt(min(a, 1.0)))
 
         return R * c
 
+    def calculate_segment_distances(self, points):
+        """Calculate Haversine distances (meters) between all consecutive points."""
+        return self.calculate_coordinate_distances([p.latitude for p in points],
+                                                   [p.longitude for p in points])
+
+    def calculate_coordinate_distances(self, latitudes, longitudes):
+        """
+        Calculate Haversine distances (meters) between consecutive coordinates.
+
+        Same formula as calculate_distance, but takes plain degree lists and
+        computes each point's radians and latitude cosine once, reusing them for
+        both pairs the point belongs to. Steps below EQUIRECTANGULAR_MAX_STEP
+        use the equirectangular approximation, which agrees to within 1mm there.
+        """
+        R = 6371000  # Earth radius in meters
+        sin, cos, asin, sqrt, hypot = math.sin, math.cos, math.asin, math.sqrt, math.hypot
+
+        lats = list(map(math.radians, latitudes))
+        lons = list(map(math.radians, longitudes))
+        cos_lats = list(map(math.cos, lats))
+
+        distances = []
+        for lat1, lat2, lon1, lon2, cos_lat1, cos_lat2 in zip(
+                lats, lats[1:], lons, lons[1:], cos_lats, cos_lats[1:]):
+            dlat = lat2 - lat1
+            dlon = lon2 - lon1
+            if abs(dlat) + abs(dlon) < EQUIRECTANGULAR_MAX_STEP:
+                # Typical sample spacing: flat-earth distance, one cos instead of Haversine
+                distances.append(R * hypot(dlon * cos((lat1 + lat2)/2), dlat))
+            else:
+                a = sin(dlat/2)**2 + cos_lat1 * cos_lat2 * sin(dlon/2)**2
+                distances.append(R * 2 * asin(sqrt(min(a, 1.0))))
+        return distances
+
+    def calculate_coordinate_steps(self, latitudes, longitudes):
+        """
+        Calculate (distances, sin_bearings, cos_bearings) between consecutive coordinates.
+
+        Distances are Haversine meters (equirectangular for short steps, as in
+        calculate_coordinate_distances). Each bearing, as in calculate_bearing,
+        is returned as the sine/cosine pair the scaling walk needs, normalized
+        straight from the atan2 arguments instead of taking atan2 and then
+        sin/cos of the result. Each point's radians and latitude sine/cosine
+        are computed once and shared by both formulas and both pairs the
+        point belongs to.
+        """
+        R = 6371000  # Earth radius in meters
+        sin, cos, asin, sqrt, hypot = math.sin, math.cos, math.asin, math.sqrt, math.hypot
+
+        lats = list(map(math.radians, latitudes))
+        lons = list(map(math.radians, longitudes))
+        sin_lats = list(map(sin, lats))
+        cos_lats = list(map(cos, lats))
+
+        distances = []
+        sin_bearings = []
+        cos_bearings = []
+        for lat1, lat2, lon1, lon2, sin_lat1, sin_lat2, cos_lat1, cos_lat2 in zip(
+                lats, lats[1:], lons, lons[1:],
+                sin_lats, sin_lats[1:], cos_lats, cos_lats[1:]):
+            dlat = lat2 - lat1
+            dlon = lon2 - lon1
+
+            if abs(dlat) + abs(dlon) < EQUIRECTANGULAR_MAX_STEP:
+                distances.append(R * hypot(dlon * cos((lat1 + lat2)/2), dlat))
+            else:
+                a = sin(dlat/2)**2 + cos_lat1 * cos_lat2 * sin(dlon/2)**2
+                distances.append(R * 2 * asin(sqrt(min(a, 1.0))))
+
+            x = sin(dlon) * cos_lat2
+            y = cos_lat1 * sin_lat2 - sin_lat1 * cos_lat2 * cos(dlon)
+            norm = hypot(x, y)
+            if norm:
+                sin_bearings.append(x / norm)
+                cos_bearings.append(y / norm)
+            else:
+                # Repeated point: atan2(0, 0) is a bearing of 0 (north)
+                sin_bearings.append(0.0)
+                cos_bearings.append(1.0)
+        return distances, sin_bearings, cos_bearings
+
     def calculate_bearing(self, point1, point2):
         """Calculate bearing (direction) from point1 to point2 in radians."""
+        sin, cos = math.sin, math.cos
         lat1 = math.radians(point1.latitude)
         lat2 = math.radians(point2.latitude)
         dlon = math.radians(point2.longitude - point1.longitude)
 
-        x = math.sin(dlon) * math.cos(lat2)
-        y = (math.cos(lat1) * math.sin(lat2) -
-             math.sin(lat1) * math.cos(lat2) * math.cos(dlon))
-
-        bearing = math.atan2(x, y)
-        return bearing
+        cos_lat2 = cos(lat2)
+        x = sin(dlon) * cos_lat2
+        y = cos(lat1) * sin(lat2) - sin(lat1) * cos_lat2 * cos(dlon)
 
-    def calculate_cycling_speed(self, power_watts, weight_kg, elevation_change_m, distance_m, grade_factor=0.04):
-        """
-        Calculate cycling speed based on power, weight, and terrain.
+        return math.atan2(x, y)
 
-        Args:
-            power_watts: Cyclist's average power output in watts
-            weight_kg: Total weight (rider + bike) in kg
-            elevation_change_m: Elevation change over the segment in meters
-            distance_m: Distance of the segment in meters
-            grade_factor: Factor for how much grade affects speed (0.04 = 4% speed reduction per 1% grade)
-
-        Returns:
-            Speed in m/s
-        """
+    def calculate_base_cycling_speed(self, power_watts, weight_kg):
+        """Calculate the flat-ground cycling speed in m/s for a power and total weight."""
         # More realistic power-to-speed calculation
         # Based on typical cycling performance: 160W at 75kg should give ~25-28 km/h flat
 
@@ -224,23 +709,61 @@ class GPXScaler:
             speed_factor = 16.0
         else:
             # Lower power: ~15-19 km/h
-            speed_factor = 15.0        # Base speed in km/h, then convert to m/s
+            speed_factor = 15.0
+
+        # Base speed in km/h, then convert to m/s
         base_speed_kmh = power_to_weight * speed_factor
-        base_speed_ms = base_speed_kmh / 3.6
-
-        # Adjust for gradient
-        if distance_m > 0:
-            gradient_percent = (elevation_change_m / distance_m) * 100
-            # Reduce speed on uphills, increase on downhills
-            speed_adjustment = 1 - (gradient_percent * grade_factor)
-            # Limit speed adjustment to reasonable bounds
-            speed_adjustment = max(0.3, min(1.8, speed_adjustment))
-            adjusted_speed = base_speed_ms * speed_adjustment
-        else:
-            adjusted_speed = base_speed_ms
+        return base_speed_kmh / 3.6
 
-        # Ensure minimum realistic cycling speed (3 m/s = 11 km/h)
-        return max(3.0, adjusted_speed)
+    def calculate_cycling_speed(self, power_watts, weight_kg, elevation_change_m, distance_m, grade_factor=0.04):
+        """
+        Calculate cycling speed based on power, weight, and terrain.
+
+        Args:
+            power_watts: Cyclist's average power output in watts
+            weight_kg: Total weight (rider + bike) in kg
+            elevation_change_m: Elevation change over the segment in meters
+            distance_m: Distance of the segment in meters
+            grade_factor: Factor for how much grade affects speed (0.04 = 4% speed reduction per 1% grade)
+
+        Returns:
+            Speed in m/s
+        """
+        return self.calculate_cycling_speeds(power_watts, weight_kg, [elevation_change_m],
+                                             [distance_m], grade_factor)[0]
+
+    def calculate_cycling_speeds(self, power_watts, weight_kg, elevation_changes, distances,
+                                 grade_factor=0.04):
+        """
+        Calculate the cycling speed for every step of a segment.
+
+        Takes the same arguments as calculate_cycling_speed, with lists of
+        elevation changes and distances. The flat-ground speed only depends on
+        power and weight, so it is worked out once for the whole segment
+        instead of once per step. Returns a list of speeds in m/s.
+        """
+        base_speed_ms = self.calculate_base_cycling_speed(power_watts, weight_kg)
+        # Ensure minimum realistic cycling speed (3 m/s = 11 km/h); zero-length
+        # steps have no gradient, so they all get the flat speed
+        flat_speed_ms = max(3.0, base_speed_ms)
+
+        speeds = []
+        append = speeds.append
+        for elevation_change_m, distance_m in zip(elevation_changes, distances):
+            if distance_m > 0:
+                gradient_percent = (elevation_change_m / distance_m) * 100
+                # Reduce speed on uphills, increase on downhills, within bounds
+                speed_adjustment = max(0.3, min(1.8, 1 - (gradient_percent * grade_factor)))
+                append(max(3.0, base_speed_ms * speed_adjustment))
+            else:
+                append(flat_speed_ms)
+        return speeds
+
+    def elevation_changes(self, points):
+        """Elevation change of each step between consecutive points, 0 where either is unknown."""
+        return [curr.elevation - prev.elevation
+                if prev.elevation is not None and curr.elevation is not None else 0
+                for prev, curr in zip(points, points[1:])]
 
     def calculate_total_ride_duration(self, gpx, power_watts, weight_kg):
         """
@@ -266,13 +789,9 @@ class GPXScaler:
             if len(route.points) < 2:
                 continue
             points = route.points
-            for i in range(1, len(points)):
-                distance = self.calculate_distance(points[i-1], points[i])
-                distance_km += distance / 1000
-                if (points[i-1].elevation is not None and points[i].elevation is not None):
-                    elevation_change = points[i].elevation - points[i-1].elevation
-                    if elevation_change > 0:
-                        ascent_m += elevation_change
+            distance_km += sum(self.calculate_segment_distances(points)) / 1000
+            uphill, _ = raw_uphill_downhill([p.elevation for p in points])
+            ascent_m += uphill
 
         # Use physics-based algorithm
         duration_hours = self.estimate_cycling_time_physics(distance_km, ascent_m, power_watts, weight_kg)
@@ -353,33 +872,19 @@ class GPXScaler:
                 # Get corresponding original segment if available
                 if scaled_segment_index < len(original_segments):
                     original_points = original_segments[scaled_segment_index]
+                    original_points = original_points[:len(segment.points)]
 
-                    # Calculate times for subsequent points using ORIGINAL distances/elevations
-                    for i in range(1, min(len(segment.points), len(original_points))):
-                        if i < len(original_points):
-                            # Use original route data for timing calculation
-                            original_prev = original_points[i-1]
-                            original_curr = original_points[i]
-
-                            # Calculate distance and elevation change from ORIGINAL route
-                            distance_m = self.calculate_distance(original_prev, original_curr)
-
-                            elevation_change = 0
-                            if (original_prev.elevation is not None and
-                                original_curr.elevation is not None):
-                                elevation_change = original_curr.elevation - original_prev.elevation
-
-                            # Calculate speed and time for this segment using original data
-                            speed_ms = self.calculate_cycling_speed(
-                                power_watts, weight_kg, elevation_change, distance_m
-                            )
+                    # Calculate distances and speeds from the ORIGINAL route in one pass each
+                    distances = self.calculate_segment_distances(original_points)
+                    speeds = self.calculate_cycling_speeds(
+                        power_watts, weight_kg, self.elevation_changes(original_points), distances)
 
-                            # Calculate time for this segment
-                            time_seconds = distance_m / speed_ms
-                            current_time += timedelta(seconds=time_seconds)
+                    # Calculate times for subsequent points using ORIGINAL distances/elevations
+                    for scaled_point, distance_m, speed_ms in zip(segment.points[1:], distances, speeds):
+                        current_time += timedelta(seconds=distance_m / speed_ms)
 
                         # Set time for current point in scaled route
-                        segment.points[i].time = current_time
+                        scaled_point.time = current_time
 
                 scaled_segment_index += 1
 
@@ -442,27 +947,15 @@ class GPXScaler:
                 # Set time for first point
                 segment.points[0].time = current_time
 
-                # Calculate times for subsequent points
-                for i in range(1, len(segment.points)):
-                    prev_point = segment.points[i-1]
-                    curr_point = segment.points[i]
-
-                    # Calculate distance and elevation change
-                    distance_m = self.calculate_distance(prev_point, curr_point)
-
-                    elevation_change = 0
-                    if (prev_point.elevation is not None and
-                        curr_point.elevation is not None):
-                        elevation_change = curr_point.elevation - prev_point.elevation
-
-                    # Calculate speed and time for this segment
-                    speed_ms = self.calculate_cycling_speed(
-                        power_watts, weight_kg, elevation_change, distance_m
-                    )
+                # Calculate all step distances and speeds in one pass each
+                points = segment.points
+                distances = self.calculate_segment_distances(points)
+                speeds = self.calculate_cycling_speeds(
+                    power_watts, weight_kg, self.elevation_changes(points), distances)
 
-                    # Calculate time for this segment
-                    time_seconds = distance_m / speed_ms
-                    current_time += timedelta(seconds=time_seconds)
+                # Calculate times for subsequent points
+                for curr_point, distance_m, speed_ms in zip(points[1:], distances, speeds):
+                    current_time += timedelta(seconds=distance_m / speed_ms)
 
                     # Set time for current point
                     curr_point.time = current_time
@@ -470,65 +963,140 @@ class GPXScaler:
     def calculate_destination_point(self, lat, lon, bearing, distance):
         """Calculate destination point given start point, bearing and distance."""
         R = 6371000  # Earth radius in meters
+        sin, cos = math.sin, math.cos
 
         lat1 = math.radians(lat)
         lon1 = math.radians(lon)
 
-        lat2 = math.asin(math.sin(lat1) * math.cos(distance/R) +
-                         math.cos(lat1) * math.sin(distance/R) * math.cos(bearing))
+        # Each sine/cosine is needed twice below, so compute it once
+        angular_distance = distance / R
+        sin_d, cos_d = sin(angular_distance), cos(angular_distance)
+        sin_lat1, cos_lat1 = sin(lat1), cos(lat1)
+
+        # sin(lat2) is the asin argument itself, so it needs no further sin call
+        sin_lat2 = sin_lat1 * cos_d + cos_lat1 * sin_d * cos(bearing)
+        lat2 = math.asin(sin_lat2)
 
-        lon2 = lon1 + math.atan2(math.sin(bearing) * math.sin(distance/R) * math.cos(lat1),
-                                 math.cos(distance/R) - math.sin(lat1) * math.sin(lat2))
+        lon2 = lon1 + math.atan2(sin(bearing) * sin_d * cos_lat1,
+                                 cos_d - sin_lat1 * sin_lat2)
 
         return math.degrees(lat2), math.degrees(lon2)
 
+    def walk_scaled_steps(self, start_lat, start_lon, distances, sin_bearings,
+                          cos_bearings, scale):
+        """
+        Walk from a start point along the given bearings with scaled distances.
+
+        Chains calculate_destination_point for every step and returns the
+        (lat, lon) of each point after the start. Bearings are given as their
+        sines/cosines (see calculate_coordinate_steps) and the walk stays in
+        radians. Scaled steps shorter than TANGENT_PLANE_MAX_STEP are taken on
+        the local tangent plane (midpoint latitude for the longitude step),
+        which only needs one cos; see that constant for the drift this allows.
+        The scaled angular step is what is compared, so large scale factors
+        fall back to the spherical formula.
+        """
+        R = 6371000  # Earth radius in meters
+        sin, cos, asin, atan2, degrees = math.sin, math.cos, math.asin, math.atan2, math.degrees
+        radians_per_meter = scale / R
+
+        # The walk is inherently sequential, so keep the loop body to local
+        # names and arithmetic; angular distances are formed inline
+        lat = math.radians(start_lat)
+        lon = math.radians(start_lon)
+        positions = []
+        append = positions.append
+        for distance, sin_b, cos_b in zip(distances, sin_bearings, cos_bearings):
+            d = distance * radians_per_meter
+            if d < TANGENT_PLANE_MAX_STEP:
+                new_lat = lat + d * cos_b
+                lon += d * sin_b / cos((lat + new_lat) * 0.5)
+            else:
+                sin_d, cos_d = sin(d), cos(d)
+                sin_lat, cos_lat = sin(lat), cos(lat)
+                sin_new_lat = sin_lat * cos_d + cos_lat * sin_d * cos_b
+                new_lat = asin(sin_new_lat)
+                lon += atan2(sin_b * sin_d * cos_lat, cos_d - sin_lat * sin_new_lat)
+            lat = new_lat
+            append((degrees(lat), degrees(lon)))
+        return positions
+
+    def scale_segment_points(self, points, start_lat, start_lon, base_elevation,
+                             distance_scale, elevation_scale):
+        """
+        Relocate and scale a list of track or route points in place.
+
+        The first point moves to the start coordinates and base elevation. Each
+        following point keeps its original bearing from the previous point, with
+        the step distance scaled by distance_scale and the elevation change by
+        elevation_scale. All new values are computed first and written back to
+        the gpxpy points in a single trailing loop.
+        """
+        # Keep the original values as plain floats rather than copying points
+        original_lats = [p.latitude for p in points]
+        original_lons = [p.longitude for p in points]
+        original_elevations = [p.elevation for p in points]
+
+        # Walk the original steps (distance, bearing) with scaled distances
+        original_distances, sin_bearings, cos_bearings = self.calculate_coordinate_steps(
+            original_lats, original_lons)
+        positions = [(start_lat, start_lon)]
+        positions += self.walk_scaled_steps(
+            start_lat, start_lon, original_distances, sin_bearings, cos_bearings,
+            distance_scale)
+
+        # Accumulate scaled elevation changes; if either side of a step has no
+        # elevation data, keep the previous elevation
+        if any(e is not None for e in original_elevations):
+            elevations = [base_elevation]
+            for prev, cur in zip(original_elevations, original_elevations[1:]):
+                if prev is not None and cur is not None:
+                    elevations.append(elevations[-1] + (cur - prev) * elevation_scale)
+                else:
+                    elevations.append(elevations[-1])
+        else:
+            # No elevation data at all: the whole segment stays at the base
+            elevations = [base_elevation] * len(points)
+
+        for point, (lat, lon), elevation in zip(points, positions, elevations):
+            point.latitude = lat
+            point.longitude = lon
+            point.elevation = elevation
+
     def analyze_gpx_file(self, gpx_file):
         """Analyze a GPX file to extract distance and elevation statistics."""
         try:
-            with open(gpx_file, 'r') as f:
-                gpx = gpxpy.parse(f)
-
             total_distance = 0
             total_ascent = 0
             total_descent = 0
 
-            # Process tracks using gpxpy's built-in methods (much faster)
-            for track in gpx.tracks:
-                for segment in track.segments:
-                    if len(segment.points) < 2:
-                        continue
-
-                    # Use gpxpy's built-in length calculation (optimized)
-                    segment_distance = segment.length_2d()
-                    if segment_distance:
-                        total_distance += segment_distance
-
-                    # Calculate elevation gains/losses
-                    uphill, downhill = segment.get_uphill_downhill()
-                    if uphill:
+            # Stream the points instead of building the full gpxpy object tree;
+            # only coordinates and elevations are needed here
+            for kind, latitudes, longitudes, elevations in iter_gpx_segments(gpx_file):
+                if len(latitudes) < 2:
+                    continue
+                # Files exported without elevation data skip the ascent work
+                has_elevation = any(e is not None for e in elevations)
+
+                if kind == 'track':
+                    # Same results as gpxpy's segment.length_2d() and
+                    # segment.get_uphill_downhill()
+                    total_distance += sum(
+                        gpxpy.geo.distance(lat2, lon2, None, lat1, lon1, None)
+                        for lat1, lat2, lon1, lon2 in zip(latitudes, latitudes[1:],
+                                                          longitudes, longitudes[1:]))
+                    if has_elevation:
+                        uphill, downhill = gpxpy.geo.calculate_uphill_downhill(elevations)
                         total_ascent += uphill
-                    if downhill:
                         total_descent += downhill
+                else:
+                    # Routes use the Haversine distance and raw elevation changes
+                    total_distance += sum(self.calculate_coordinate_distances(latitudes, longitudes))
 
-            # Process routes using manual calculation (no built-in methods)
-            for route in gpx.routes:
-                if len(route.points) < 2:
-                    continue
-
-                # Calculate distance manually for routes
-                points = route.points
-                for i in range(1, len(points)):
-                    distance = self.calculate_distance(points[i-1], points[i])
-                    total_distance += distance
-
-                    if (points[i-1].elevation is not None and
-                            points[i].elevation is not None):
-                        elevation_change = (points[i].elevation -
-                                            points[i-1].elevation)
-                        if elevation_change > 0:
-                            total_ascent += elevation_change
-                        else:
-                            total_descent += abs(elevation_change)
+                    if has_elevation:
+                        uphill, downhill = raw_uphill_downhill(elevations)
+                        total_ascent += uphill
+                        total_descent += downhill
 
             return {
                 'distance_km': total_distance / 1000,
@@ -540,15 +1108,66 @@ class GPXScaler:
             print(f"Error analyzing {gpx_file}: {e}")
             return None
 
+    def route_stats_cache_key(self, gpx_file):
+        """Key analysis results on the resolved path, mtime and size of a file."""
+        path = Path(gpx_file).resolve()
+        stat = path.stat()
+        return str(path), stat.st_mtime_ns, stat.st_size
+
+    def load_route_stats_cache(self):
+        """Load previously computed route statistics from disk (once per instance)."""
+        if self.route_stats_cache is None:
+            try:
+                with open(ROUTE_STATS_CACHE_FILE, 'rb') as f:
+                    self.route_stats_cache = pickle.load(f)
+            except Exception:
+                self.route_stats_cache = {}
+        return self.route_stats_cache
+
+    def save_route_stats_cache(self):
+        """Write the route statistics cache back to disk, dropping outdated entries."""
+        latest = {}
+        for key in self.route_stats_cache:
+            path, mtime_ns, _ = key
+            if path not in latest or mtime_ns > latest[path][1]:
+                latest[path] = key
+        self.route_stats_cache = {key: self.route_stats_cache[key] for key in latest.values()}
+        try:
+            ROUTE_STATS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(ROUTE_STATS_CACHE_FILE, 'wb') as f:
+                pickle.dump(self.route_stats_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Warning: Could not save route statistics cache: {e}")
+
     def analyze_all_files(self):
         """Analyze all found GPX files and display statistics."""
         print("\n" + "="*80)
         print("GPX ROUTE ANALYSIS")
         print("="*80)
 
-        # Analyze all files first
+        # Reuse results for files that have not changed since they were last
+        # analyzed, on this run or a previous one
+        stats_cache = self.load_route_stats_cache()
+        cache_keys = {gpx_file: self.route_stats_cache_key(gpx_file)
+                      for gpx_file in self.gpx_files}
+        pending_files = [gpx_file for gpx_file in self.gpx_files
+                         if cache_keys[gpx_file] not in stats_cache]
+
+        # Analyze the rest; files are independent, so use one process per core
+        if len(pending_files) > 1:
+            with ProcessPoolExecutor(initializer=_init_worker) as executor:
+                new_stats = list(executor.map(_analyze_file_worker, pending_files))
+        else:
+            new_stats = [self.analyze_gpx_file(gpx_file) for gpx_file in pending_files]
+
+        for gpx_file, stats in zip(pending_files, new_stats):
+            if stats:
+                stats_cache[cache_keys[gpx_file]] = stats
+        if any(new_stats):
+            self.save_route_stats_cache()
+
         for gpx_file in self.gpx_files:
-            stats = self.analyze_gpx_file(gpx_file)
+            stats = stats_cache.get(cache_keys[gpx_file])
             if stats:
                 self.route_stats[gpx_file] = stats
 
@@ -557,77 +1176,143 @@ class GPXScaler:
             print(f"\n{'Route Name':<35} {'Distance (km)':<15} {'Ascent (m)':<12} {'Descent (m)':<12}")
             print("-" * 80)
 
-            # Sort routes by stage number (numerical order)
-            sorted_routes = sorted(self.route_stats.items(),
-                                   key=lambda x: self.extract_stage_number(x[0].name))
-
-            for gpx_file, stats in sorted_routes:
+            # Routes are already in stage order (see find_gpx_files); the
+            # summary totals accumulate in the same pass as the rows
+            total_distance = total_ascent = total_descent = 0
+            for gpx_file, stats in self.route_stats.items():
                 filename = gpx_file.name
                 if len(filename) > 34:
                     filename = filename[:31] + "..."
                 print(f"{filename:<35} {stats['distance_km']:<15.2f} {stats['ascent_m']:<12.0f} {stats['descent_m']:<12.0f}")
-
-            # Summary
-            total_distance = sum(stats['distance_km'] for stats in self.route_stats.values())
-            total_ascent = sum(stats['ascent_m'] for stats in self.route_stats.values())
-            total_descent = sum(stats['descent_m'] for stats in self.route_stats.values())
+                total_distance += stats['distance_km']
+                total_ascent += stats['ascent_m']
+                total_descent += stats['descent_m']
 
             print("-" * 80)
             print(f"{'TOTAL:':<35} {total_distance:<15.2f} {total_ascent:<12.0f} {total_descent:<12.0f}")
             print("="*80)
 
-    def get_current_location(self):
-        """Attempt to get current device location."""
-        try:
-            # Try ipapi.co for location based on IP
-            response = requests.get('http://ipapi.co/json/', timeout=3)  # Reduced timeout
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('latitude'), data.get('longitude')
-        except:
-            pass
+    def query_endpoints(self, endpoints, timeout, description=None, **params):
+        """
+        Query all endpoints at once and return the first usable parsed result.
 
+        endpoints are (name, URL template, parser) tuples; URLs are formatted
+        with params. Requests run in threads, so the wait is the fastest
+        successful response rather than the sum of every timeout. Failures are
+        reported as warnings when a description is given. Returns None if no
+        endpoint answers with a result.
+        """
+        executor = ThreadPoolExecutor(max_workers=len(endpoints))
         try:
-            # Alternative: ip-api.com
-            response = requests.get('http://ip-api.com/json/', timeout=3)  # Reduced timeout
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('status') == 'success':
-                    return data.get('lat'), data.get('lon')
-        except:
-            pass
+            futures = {executor.submit(self.session.get, url_template.format(**params),
+                                       timeout=timeout): (name, parse)
+                       for name, url_template, parse in endpoints}
+            for future in as_completed(futures):
+                name, parse = futures[future]
+                try:
+                    response = future.result()
+                    if response.status_code == 200:
+                        result = parse(_response_json(response))
+                        if result is not None:
+                            return result
+                except Exception as e:
+                    if description:
+                        print(f"Warning: Could not get {description} from {name}: {e}")
+            return None
+        finally:
+            # Don't wait for slower endpoints once we have an answer
+            executor.shutdown(wait=False, cancel_futures=True)
 
+    def get_current_location(self):
+        """Attempt to get current device location."""
+        location = self.query_endpoints(LOCATION_ENDPOINTS, timeout=3)
+        if location is not None:
+            return location
         return None, None
 
-    def get_elevation(self, lat, lon):
-        """Get elevation at given coordinates using online elevation API."""
+    def elevation_cache_key(self, lat, lon):
+        """Round coordinates to 3 decimals (~110m) for elevation cache lookups."""
+        return f"{lat:.3f},{lon:.3f}"
+
+    def load_elevation_cache(self):
+        """Load previously fetched elevations from disk (once per instance)."""
+        if self.elevation_cache is None:
+            try:
+                with open(ELEVATION_CACHE_FILE, 'r') as f:
+                    self.elevation_cache = json.load(f)
+            except Exception:
+                self.elevation_cache = {}
+        return self.elevation_cache
+
+    def save_elevation_cache(self):
+        """Write the elevation cache back to disk."""
         try:
-            # Try Open-Elevation API (free, no API key required)
-            url = f"https://api.open-elevation.com/api/v1/lookup?locations={lat},{lon}"
-            response = requests.get(url, timeout=5)  # Reduced timeout
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('results') and len(data['results']) > 0:
-                    elevation = data['results'][0].get('elevation')
-                    if elevation is not None:
-                        print(f"Found real elevation at starting coordinates: {elevation}m")
-                        return elevation
+            ELEVATION_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(ELEVATION_CACHE_FILE, 'w') as f:
+                json.dump(self.elevation_cache, f)
         except Exception as e:
-            print(f"Warning: Could not get elevation from Open-Elevation API: {e}")
+            print(f"Warning: Could not save elevation cache: {e}")
 
-        try:
-            # Fallback: Try elevation-api.io (also free)
-            url = f"https://elevation-api.io/api/elevation?points=({lat},{lon})"
-            response = requests.get(url, timeout=5)  # Reduced timeout
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('elevations') and len(data['elevations']) > 0:
-                    elevation = data['elevations'][0].get('elevation')
+    def get_elevation(self, lat, lon):
+        """Get elevation at given coordinates, using the on-disk cache before the online APIs."""
+        cache = self.load_elevation_cache()
+        cache_key = self.elevation_cache_key(lat, lon)
+        if cache_key in cache:
+            elevation = cache[cache_key]
+            print(f"Using cached elevation at starting coordinates: {elevation}m")
+            return elevation
+
+        elevation = self.fetch_elevation(lat, lon)
+        if elevation is not None:
+            cache[cache_key] = elevation
+            self.save_elevation_cache()
+        return elevation
+
+    def get_elevations(self, coordinates):
+        """
+        Get elevations for several (lat, lon) pairs with one Open-Elevation request.
+
+        Coordinates already in the cache are not requested again, and any the
+        batch request cannot resolve are looked up one by one from the other
+        services. Returns a list in the order of coordinates, with None where
+        no elevation could be found.
+        """
+        cache = self.load_elevation_cache()
+        missing = {}
+        for lat, lon in coordinates:
+            cache_key = self.elevation_cache_key(lat, lon)
+            if cache_key not in cache:
+                missing[cache_key] = (lat, lon)
+
+        if missing:
+            try:
+                locations = [{'latitude': lat, 'longitude': lon} for lat, lon in missing.values()]
+                response = self.session.post(OPEN_ELEVATION_LOOKUP_URL,
+                                             json={'locations': locations}, timeout=10)
+                if response.status_code == 200:
+                    results = _response_json(response).get('results') or []
+                    for cache_key, result in zip(missing, results):
+                        if result.get('elevation') is not None:
+                            cache[cache_key] = result['elevation']
+            except Exception as e:
+                print(f"Warning: Could not get elevations from Open-Elevation API: {e}")
+
+            for cache_key, (lat, lon) in missing.items():
+                if cache_key not in cache:
+                    elevation = self.fetch_elevation(lat, lon)
                     if elevation is not None:
-                        print(f"Found real elevation at starting coordinates: {elevation}m")
-                        return elevation
-        except Exception as e:
-            print(f"Warning: Could not get elevation from elevation-api.io: {e}")
+                        cache[cache_key] = elevation
+            self.save_elevation_cache()
+
+        return [cache.get(self.elevation_cache_key(lat, lon)) for lat, lon in coordinates]
+
+    def fetch_elevation(self, lat, lon):
+        """Get elevation at given coordinates using online elevation API."""
+        elevation = self.query_endpoints(ELEVATION_ENDPOINTS, timeout=5,
+                                         description="elevation", lat=lat, lon=lon)
+        if elevation is not None:
+            print(f"Found real elevation at starting coordinates: {elevation}m")
+            return elevation
 
         print("Warning: Could not retrieve elevation data. Using original base elevation.")
         return None
@@ -680,29 +1365,24 @@ class GPXScaler:
         print(f"\n{'Route Name':<35} {'Orig Dist':<10} {'Scaled Dist':<12} {'Dist Scale':<10} {'Elev Scale':<10} {'Orig Ascent':<11} {'Ascent (m)':<10}")
         print("-" * 110)
 
-        # Sort routes by stage number (numerical order)
-        sorted_routes = sorted(self.route_stats.items(),
-                               key=lambda x: self.extract_stage_number(x[0].name))
-
-        total_original_distance = 0
-        total_scaled_distance = 0
-        total_scaled_ascent = 0
-        total_scaled_descent = 0
+        # Every route gets the same scales, so choose them once
+        actual_distance_scale = scale_factor
+        if ascent_scale is not None:
+            actual_elevation_scale = ascent_scale
+        else:
+            actual_elevation_scale = scale_factor
+        print(f"[TRACE] preview_scaling_results: actual_distance_scale={actual_distance_scale}, actual_elevation_scale={actual_elevation_scale}")
 
-        for gpx_file, stats in sorted_routes:
+        # Original totals accumulate in the same pass as the table rows
+        total_original_distance = total_original_ascent = total_original_descent = 0
+        # Routes are already in stage order (see find_gpx_files)
+        for gpx_file, stats in self.route_stats.items():
             original_distance = stats['distance_km']
-            if ascent_scale is not None:
-                actual_distance_scale = scale_factor
-                actual_elevation_scale = ascent_scale
-            else:
-                actual_distance_scale = scale_factor
-                actual_elevation_scale = scale_factor
-
-            print(f"[TRACE] preview_scaling_results: file={gpx_file.name}, actual_distance_scale={actual_distance_scale}, actual_elevation_scale={actual_elevation_scale}")
-
             scaled_distance = original_distance * actual_distance_scale
             scaled_ascent = stats['ascent_m'] * actual_elevation_scale
-            scaled_descent = stats['descent_m'] * actual_elevation_scale
+            total_original_distance += original_distance
+            total_original_ascent += stats['ascent_m']
+            total_original_descent += stats['descent_m']
 
             filename = gpx_file.name
             if len(filename) > 34:
@@ -710,10 +1390,10 @@ class GPXScaler:
 
             print(f"{filename:<35} {original_distance:<10.1f} {scaled_distance:<12.1f} {actual_distance_scale:<10.3f} {actual_elevation_scale:<10.3f} {stats['ascent_m']:<11.0f} {scaled_ascent:<10.0f}")
 
-            total_original_distance += original_distance
-            total_scaled_distance += scaled_distance
-            total_scaled_ascent += scaled_ascent
-            total_scaled_descent += scaled_descent
+        # Uniform scales factor out of the totals
+        total_scaled_distance = total_original_distance * actual_distance_scale
+        total_scaled_ascent = total_original_ascent * actual_elevation_scale
+        total_scaled_descent = total_original_descent * actual_elevation_scale
 
         print("-" * 110)
         print(f"{'TOTAL:':<35} {total_original_distance:<10.1f} {total_scaled_distance:<12.1f} {'':>32} {total_scaled_ascent:<10.0f}")
@@ -746,20 +1426,9 @@ class GPXScaler:
             print(f"[TRACE] scale_gpx_file: file={gpx_file.name}, actual_distance_scale={actual_distance_scale}, actual_elevation_scale={actual_elevation_scale}")
 
             # Find the first point to use as reference for original base elevation
-            first_point = None
-            for track in gpx.tracks:
-                for segment in track.segments:
-                    if segment.points:
-                        first_point = segment.points[0]
-                        break
-                if first_point:
-                    break
-
-            if not first_point:
-                for route in gpx.routes:
-                    if route.points:
-                        first_point = route.points[0]
-                        break
+            first_point = (next((segment.points[0] for track in gpx.tracks
+                                 for segment in track.segments if segment.points), None)
+                           or next((route.points[0] for route in gpx.routes if route.points), None))
 
             if not first_point:
                 print(f"Warning: No points found in {gpx_file.name}")
@@ -774,104 +1443,23 @@ class GPXScaler:
             else:
                 new_base_elevation = original_base_elevation
 
-            # Note: Timing will be calculated AFTER scaling using scaled distances            # Scale tracks - properly scale the route path using vector-based scaling
+            # Note: Timing will be calculated AFTER scaling using scaled distances
+            # Scale tracks - properly scale the route path using vector-based scaling
             for track in gpx.tracks:
                 for segment in track.segments:
                     if len(segment.points) < 2:
                         continue
-
-                    # Store original points for reference
-                    original_points = [gpxpy.gpx.GPXTrackPoint(p.latitude, p.longitude, p.elevation)
-                                     for p in segment.points]
-
-                    # Set first point to new starting location
-                    segment.points[0].latitude = start_lat
-                    segment.points[0].longitude = start_lon
-                    segment.points[0].elevation = new_base_elevation
-
-                    # Scale each subsequent point based on the vector from the previous point
-                    for i in range(1, len(segment.points)):
-                        # Get the previous point (already scaled)
-                        prev_point = segment.points[i-1]
-
-                        # Calculate the original vector from previous to current point
-                        original_distance = self.calculate_distance(original_points[i-1], original_points[i])
-                        original_bearing = self.calculate_bearing(original_points[i-1], original_points[i])
-
-                        # Scale the distance vector
-                        scaled_distance = original_distance * actual_distance_scale
-
-                        # Calculate new position using scaled vector from previous scaled point
-                        new_lat, new_lon = self.calculate_destination_point(
-                            prev_point.latitude, prev_point.longitude,
-                            original_bearing, scaled_distance
-                        )
-
-                        # Update point position
-                        segment.points[i].latitude = new_lat
-                        segment.points[i].longitude = new_lon
-
-                        # Always use actual_elevation_scale for elevation
-                        if (original_points[i-1].elevation is not None and
-                            original_points[i].elevation is not None):
-                            original_elevation_change = original_points[i].elevation - original_points[i-1].elevation
-                            scaled_elevation_change = original_elevation_change * actual_elevation_scale
-                            segment.points[i].elevation = prev_point.elevation + scaled_elevation_change
-                        else:
-                            # If no elevation data, keep same as previous
-                            segment.points[i].elevation = prev_point.elevation
+                    self.scale_segment_points(segment.points, start_lat, start_lon,
+                                              new_base_elevation, actual_distance_scale,
+                                              actual_elevation_scale)
 
             # Scale routes using the same vector-based logic as tracks
             for route in gpx.routes:
                 if len(route.points) < 2:
                     continue
-
-                # Store original points for reference
-                original_points = [gpxpy.gpx.GPXRoutePoint(p.latitude, p.longitude, p.elevation)
-                                 for p in route.points]
-
-                # Set first point to new starting location
-                route.points[0].latitude = start_lat
-                route.points[0].longitude = start_lon
-                route.points[0].elevation = new_base_elevation
-
-                # Scale each subsequent point based on vector from previous point
-                for i in range(1, len(route.points)):
-                    # Get the previous point (already scaled)
-                    prev_point = route.points[i-1]
-
-                    # Calculate original vector from previous to current point
-                    original_distance = self.calculate_distance(
-                        original_points[i-1], original_points[i])
-                    original_bearing = self.calculate_bearing(
-                        original_points[i-1], original_points[i])
-
-                    # Scale the distance vector
-                    scaled_distance = original_distance * actual_distance_scale
-
-                    # Calculate new position using scaled vector from previous
-                    new_lat, new_lon = self.calculate_destination_point(
-                        prev_point.latitude, prev_point.longitude,
-                        original_bearing, scaled_distance
-                    )
-
-                    # Update point position
-                    route.points[i].latitude = new_lat
-                    route.points[i].longitude = new_lon
-
-                    # Always use actual_elevation_scale for elevation
-                    if (original_points[i-1].elevation is not None and
-                            original_points[i].elevation is not None):
-                        original_elevation_change = (
-                            original_points[i].elevation -
-                            original_points[i-1].elevation)
-                        scaled_elevation_change = (
-                            original_elevation_change * actual_elevation_scale)
-                        route.points[i].elevation = (
-                            prev_point.elevation + scaled_elevation_change)
-                    else:
-                        # If no elevation data, keep same as previous
-                        route.points[i].elevation = prev_point.elevation
+                self.scale_segment_points(route.points, start_lat, start_lon,
+                                          new_base_elevation, actual_distance_scale,
+                                          actual_elevation_scale)
 
             # Add timing data AFTER scaling (using scaled distances and elevations)
             if add_timing and power_watts is not None and weight_kg is not None:
@@ -903,8 +1491,8 @@ class GPXScaler:
                 base_filename = f"{clean_base_name}{original_file_stem}"
 
                 # Extract stage number from filename for display name
-                stage_number = self.extract_stage_number(original_filename or gpx_file.name)
-                if isinstance(stage_number, int):
+                stage_number, _ = self.extract_stage_number(original_filename or gpx_file.name)
+                if stage_number != float('inf'):
                     display_name = f"{base_name} {stage_number}"
                 else:
                     display_name = f"{base_name} {original_file_stem}"
@@ -945,24 +1533,24 @@ class GPXScaler:
             # Save file in appropriate format
             # Always use the scaled GPX for all output formats
             if output_format in ['fit', 'tcx']:
-                temp_gpx = scaled_folder / f"temp_{gpx_file.stem}.gpx"
-                with open(temp_gpx, 'w') as f:
-                    f.write(gpx.to_xml())
+                # GPSBabel reads the scaled document from stdin, so no temp
+                # GPX file is written; gpx_file only names it in messages
+                gpx_xml = gpx_to_xml(gpx)
 
                 # Convert to requested format with timing information
                 # Ensure conversion functions only use the scaled GPX
                 if output_format == 'fit':
-                    success = self.convert_gpx_to_fit_format(temp_gpx, output_file, add_timing)
+                    success = self.convert_gpx_to_fit_format(gpx_file, output_file, add_timing,
+                                                             gpx_xml=gpx_xml)
                 else:  # tcx
-                    success = self.convert_gpx_to_tcx_format(temp_gpx, output_file, add_timing)
+                    success = self.convert_gpx_to_tcx_format(gpx_file, output_file, add_timing,
+                                                             gpx_xml=gpx_xml)
 
-                # Note: temp file cleanup is handled by conversion functions
                 if not success:
                     return False
             else:
                 # Save as GPX (already scaled)
-                with open(output_file, 'w') as f:
-                    f.write(gpx.to_xml())
+                write_gpx(gpx, output_file)
 
             print(f"Scaled {gpx_file.name} → {output_file.name}")
             return True
@@ -1056,20 +1644,38 @@ class GPXScaler:
 
         print("\nProcessing files...")
 
-        success_count = 0
         # Ensure ascent_scale is always passed from config if not explicitly provided
         config = self.load_config()
         print(f"[TRACE] scale_all_files: Loaded config ascent_scale={config.get('ascent_scale')}")
         effective_ascent_scale = ascent_scale if ascent_scale is not None else config.get('ascent_scale')
         print(f"[TRACE] scale_all_files: Using ascent_scale={effective_ascent_scale}")
-        for gpx_file in self.gpx_files:
-            print(f"[TRACE] scale_all_files: Passing ascent_scale={effective_ascent_scale} to scale_gpx_file for {gpx_file}")
-            if self.scale_gpx_file(gpx_file, scale_factor, start_lat, start_lon,
-                                   min_distance_km, max_ascent_m, starting_elevation,
-                                   scaled_folder, output_format, base_name,
-                                   add_timing, power_watts, weight_kg,
-                                   ascent_scale=effective_ascent_scale):
-                success_count += 1
+        scale_kwargs = {
+            'scale_factor': scale_factor,
+            'start_lat': start_lat,
+            'start_lon': start_lon,
+            'min_distance_km': min_distance_km,
+            'max_ascent_m': max_ascent_m,
+            'starting_elevation': starting_elevation,
+            'output_folder': scaled_folder,
+            'output_format': output_format,
+            'base_name': base_name,
+            'add_timing': add_timing,
+            'power_watts': power_watts,
+            'weight_kg': weight_kg,
+            'ascent_scale': effective_ascent_scale
+        }
+        print(f"[TRACE] scale_all_files: Passing ascent_scale={effective_ascent_scale} to scale_gpx_file for {len(self.gpx_files)} files")
+
+        # Each file is scaled independently, so spread them across processes
+        if len(self.gpx_files) > 1:
+            # The options are the same for every file, so send them once per
+            # worker process instead of with every task
+            with ProcessPoolExecutor(initializer=_init_worker,
+                                     initargs=(scale_kwargs,)) as executor:
+                results = list(executor.map(_scale_file_worker, self.gpx_files))
+        else:
+            results = [self.scale_gpx_file(gpx_file, **scale_kwargs) for gpx_file in self.gpx_files]
+        success_count = sum(1 for success in results if success)
 
         print(f"\nCompleted: {success_count}/{len(self.gpx_files)} files processed successfully.")
 
@@ -1090,51 +1696,7 @@ class GPXScaler:
 
     def get_flat_terrain_coordinates(self):
         """Get predefined coordinates that are Garmin-compatible."""
-        flat_locations = [
-            {
-                'name': 'North Sea (Garmin-compatible offshore)',
-                'lat': 54.0,
-                'lon': 3.0,
-                'description': 'Offshore North Sea - flat water, Garmin-compatible coordinates'
-            },
-            {
-                'name': 'English Channel (moderate offshore)',
-                'lat': 50.5,
-                'lon': 0.0,
-                'description': 'English Channel - flat water, commonly used coordinates'
-            },
-            {
-                'name': 'Mediterranean Sea (stable coordinates)',
-                'lat': 40.0,
-                'lon': 15.0,
-                'description': 'Mediterranean Sea - flat, stable coordinates for Garmin'
-            },
-            {
-                'name': 'Baltic Sea (conservative offshore)',
-                'lat': 58.0,
-                'lon': 18.0,
-                'description': 'Baltic Sea - flat water, conservative European coordinates'
-            },
-            {
-                'name': 'Bay of Biscay (Atlantic offshore)',
-                'lat': 45.0,
-                'lon': -5.0,
-                'description': 'Bay of Biscay - flat Atlantic area, moderate coordinates'
-            },
-            {
-                'name': 'Netherlands Coast (minimal elevation)',
-                'lat': 52.5,
-                'lon': 4.0,
-                'description': 'Just off Netherlands coast - very flat, Garmin-friendly'
-            },
-            {
-                'name': 'Remote Pacific Ocean (anti-Garmin elevation)',
-                'lat': 0.0,
-                'lon': 180.0,
-                'description': 'International Date Line - for testing only, may cause import issues'
-            }
-        ]
-        return flat_locations
+        return FLAT_TERRAIN_LOCATIONS
 
     def suggest_flat_terrain_location(self):
         """Suggest flat terrain coordinates to minimize Garmin elevation conflicts."""
@@ -1161,14 +1723,8 @@ class GPXScaler:
                 choice = input("Choose an option (1-8): ").strip()
                 choice_num = int(choice)
 
-                if 1 <= choice_num <= 6:
-                    selected = flat_locations[choice_num - 1]
-                    print(f"\nSelected: {selected['name']}")
-                    print(f"Coordinates: {selected['lat']:.6f}, {selected['lon']:.6f}")
-                    confirm = input("Use these coordinates? (y/n): ").strip().lower()
-                    if confirm in ['y', 'yes', '']:
-                        return selected['lat'], selected['lon']
-                elif choice_num == 7:
+                # Options 7 and 8 take precedence over the numbered locations
+                if choice_num == 7:
                     return None, None  # Custom coordinates
                 elif choice_num == 8:
                     # Try to get current location
@@ -1183,6 +1739,13 @@ class GPXScaler:
                     else:
                         print("Could not detect current location.")
                         continue
+                elif choice_num in FLAT_TERRAIN_BY_NUMBER:
+                    selected = FLAT_TERRAIN_BY_NUMBER[choice_num]
+                    print(f"\nSelected: {selected['name']}")
+                    print(f"Coordinates: {selected['lat']:.6f}, {selected['lon']:.6f}")
+                    confirm = input("Use these coordinates? (y/n): ").strip().lower()
+                    if confirm in ['y', 'yes', '']:
+                        return selected['lat'], selected['lon']
                 else:
                     print("Please enter a number between 1 and 8.")
                     continue
@@ -1191,12 +1754,15 @@ class GPXScaler:
                 print("Please enter a valid number.")
                 continue
 
-    def create_garmin_activity_tcx(self, gpx_file_path, output_path):
+    def create_garmin_activity_tcx(self, gpx_file_path, output_path, gpx_xml=None):
         """Create a Garmin Connect compatible TCX file with Activity format."""
         try:
-            # Read the GPX file
-            with open(gpx_file_path, 'r') as f:
-                gpx = gpxpy.parse(f)
+            # Read the GPX document, from memory when it was passed in
+            if gpx_xml is not None:
+                gpx = gpxpy.parse(gpx_xml)
+            else:
+                with open(gpx_file_path, 'r') as f:
+                    gpx = gpxpy.parse(f)
 
             # Start building TCX content
             tcx_lines = []
@@ -1214,12 +1780,9 @@ class GPXScaler:
 
             print(f"✅ Activity-based TCX file created: {output_path}")
 
-            # Clean up temp file
-            try:
-                if os.path.exists(gpx_file_path):
-                    os.remove(gpx_file_path)
-            except Exception:
-                pass  # Silently ignore cleanup errors
+            # Clean up temp file (nothing to remove when the GPX came from memory)
+            if gpx_xml is None:
+                _remove_temp_file(gpx_file_path)
 
             return True
 
@@ -1227,188 +1790,173 @@ class GPXScaler:
             print(f"❌ Error creating Activity TCX: {e}")
             return False
 
-    def convert_gpx_to_fit_format(self, gpx_file_path, output_path, has_timing=False):
-        """Convert GPX to FIT format using GPSBabel with optimized settings."""
-        try:
-            import subprocess
+    def find_gpsbabel(self):
+        """
+        Locate GPSBabel on PATH, printing install help if it is missing.
 
-            # Check if GPSBabel is available
-            try:
-                subprocess.run(['gpsbabel', '-V'], capture_output=True,
-                               check=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                print("GPSBabel not found. Please install it with: "
-                      "brew install gpsbabel")
+        The lookup happens once per instance, so batch conversions do not
+        start an extra 'gpsbabel -V' process for every file.
+        """
+        if self.gpsbabel_path is None:
+            self.gpsbabel_path = shutil.which('gpsbabel') or ''
+        if not self.gpsbabel_path:
+            print("GPSBabel not found. Please install it with: "
+                  "brew install gpsbabel")
+        return self.gpsbabel_path
+
+    def _run_gpsbabel(self, gpx_file_path, output_path, output_format, filters=(),
+                      gpx_xml=None):
+        """
+        Run one GPSBabel conversion from GPX and return (output size, error output).
+
+        The GPX is read from gpx_file_path, or from stdin when gpx_xml is given.
+        filters are passed as -x options. The size is 0 when GPSBabel failed or
+        wrote nothing; the error output is None unless GPSBabel exited with an
+        error.
+        """
+        cmd = ['gpsbabel', '-i', 'gpx',
+               '-f', '-' if gpx_xml is not None else str(gpx_file_path)]
+        for gpsbabel_filter in filters:
+            cmd += ['-x', gpsbabel_filter]
+        cmd += ['-o', output_format, '-F', str(output_path)]
+
+        result = subprocess.run(cmd, input=gpx_xml, capture_output=True, text=True)
+        if result.returncode != 0:
+            return 0, result.stderr
+        return _output_file_size(output_path), None
+
+    def convert_gpx_to_fit_format(self, gpx_file_path, output_path, has_timing=False,
+                                  gpx_xml=None):
+        """
+        Convert GPX to FIT format using GPSBabel with optimized settings.
+
+        When gpx_xml is given, GPSBabel reads it from stdin and gpx_file_path
+        only names the input in messages.
+        """
+        try:
+            # Check if GPSBabel is available (looked up once per instance)
+            if not self.find_gpsbabel():
                 return False
 
             if has_timing:
                 print(f"Converting to FIT activity format (with timing): {gpx_file_path.name}")
-                # For activities with timing data, use specific FIT activity format
-                cmd = [
-                    'gpsbabel',
-                    '-i', 'gpx',
-                    '-f', str(gpx_file_path),
-                    '-o', 'garmin_fit,allpoints=1',  # Include all points for activities
-                    '-F', str(output_path)
-                ]
+                # For activities with timing data, include all points
+                output_format, filters = 'garmin_fit,allpoints=1', ()
             else:
                 print(f"Converting to FIT course format (route): {gpx_file_path.name}")
-                # For courses without timing, use course-specific options
-                cmd = [
-                    'gpsbabel',
-                    '-i', 'gpx',
-                    '-f', str(gpx_file_path),
-                    '-x', 'track,trk2rte',  # Convert tracks to routes for course format
-                    '-o', 'garmin_fit,course=1',  # Explicitly mark as course
-                    '-F', str(output_path)
-                ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                if (os.path.exists(output_path) and
-                    os.path.getsize(output_path) > 0):
-                    print(f"✅ FIT file created: {output_path}")
-
-                    # Validate FIT file size (FIT files should be reasonably sized)
-                    file_size = os.path.getsize(output_path)
-                    if file_size < 100:  # Very small files are likely invalid
-                        print(f"⚠️  Warning: FIT file is unusually small ({file_size} bytes)")
-                        print("   This may indicate conversion issues")
-                    else:
-                        print(f"   📊 FIT file size: {file_size:,} bytes")
+                # For courses, convert tracks to routes and explicitly mark as course
+                output_format, filters = 'garmin_fit,course=1', ('track,trk2rte',)
 
-                    # Clean up temp file
-                    try:
-                        if os.path.exists(gpx_file_path):
-                            os.remove(gpx_file_path)
-                    except Exception:
-                        pass  # Silently ignore cleanup errors
+            file_size, error = self._run_gpsbabel(gpx_file_path, output_path, output_format,
+                                                  filters, gpx_xml)
 
-                    return True
-                else:
-                    print("❌ GPSBabel completed but no FIT file was created")
-                    return False
-            else:
-                print(f"❌ FIT conversion failed: {result.stderr}")
+            if error is not None:
+                print(f"❌ FIT conversion failed: {error}")
                 # Try alternative FIT conversion if first attempt fails
                 print("🔄 Trying alternative FIT conversion method...")
-                return self._try_alternative_fit_conversion(gpx_file_path, output_path, has_timing)
+                return self._try_alternative_fit_conversion(gpx_file_path, output_path, has_timing,
+                                                            gpx_xml)
+            if not file_size:
+                print("❌ GPSBabel completed but no FIT file was created")
+                return False
+
+            print(f"✅ FIT file created: {output_path}")
+
+            # Validate FIT file size (FIT files should be reasonably sized)
+            if file_size < 100:  # Very small files are likely invalid
+                print(f"⚠️  Warning: FIT file is unusually small ({file_size} bytes)")
+                print("   This may indicate conversion issues")
+            else:
+                print(f"   📊 FIT file size: {file_size:,} bytes")
+
+            # Clean up temp file (nothing to remove when the GPX came from memory)
+            if gpx_xml is None:
+                _remove_temp_file(gpx_file_path)
+
+            return True
 
         except Exception as e:
             print(f"❌ Error during FIT conversion: {e}")
             return False
 
-    def _try_alternative_fit_conversion(self, gpx_file_path, output_path, has_timing=False):
+    def _try_alternative_fit_conversion(self, gpx_file_path, output_path, has_timing=False,
+                                        gpx_xml=None):
         """Alternative FIT conversion method with different GPSBabel options."""
         try:
-            import subprocess
-
             if has_timing:
                 print("   Trying activity-optimized FIT conversion...")
-                # Alternative command for activities
-                cmd = [
-                    'gpsbabel',
-                    '-i', 'gpx',
-                    '-f', str(gpx_file_path),
-                    '-x', 'track,name=Activity',  # Set track name
-                    '-o', 'garmin_fit',
-                    '-F', str(output_path)
-                ]
+                # Alternative for activities: plain FIT with a named track
+                filters = ('track,name=Activity',)
             else:
                 print("   Trying simplified FIT course conversion...")
-                # Simplified conversion for courses
-                cmd = [
-                    'gpsbabel',
-                    '-i', 'gpx',
-                    '-f', str(gpx_file_path),
-                    '-x', 'simplify,count=500',  # Limit points for courses
-                    '-o', 'garmin_fit',
-                    '-F', str(output_path)
-                ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                if (os.path.exists(output_path) and
-                    os.path.getsize(output_path) > 0):
-                    print(f"✅ Alternative FIT conversion successful: {output_path}")
-
-                    # Clean up temp file
-                    try:
-                        if os.path.exists(gpx_file_path):
-                            os.remove(gpx_file_path)
-                    except Exception:
-                        pass
-
-                    return True
-                else:
-                    print("❌ Alternative FIT conversion also failed")
-                    return False
-            else:
-                print(f"❌ Alternative FIT conversion failed: {result.stderr}")
+                # Simplified conversion for courses: limit the number of points
+                filters = ('simplify,count=500',)
+
+            file_size, error = self._run_gpsbabel(gpx_file_path, output_path, 'garmin_fit',
+                                                  filters, gpx_xml)
+
+            if error is not None:
+                print(f"❌ Alternative FIT conversion failed: {error}")
                 print("\n💡 FIT TROUBLESHOOTING TIPS:")
                 print("   1. Try using TCX format instead (often more reliable)")
                 print("   2. Ensure your GPX has valid coordinates and elevation data")
                 print("   3. Check if GPSBabel is the latest version: brew upgrade gpsbabel")
                 print("   4. Some FIT files may work in Garmin Connect despite conversion warnings")
                 return False
+            if not file_size:
+                print("❌ Alternative FIT conversion also failed")
+                return False
+
+            print(f"✅ Alternative FIT conversion successful: {output_path}")
+
+            # Clean up temp file (nothing to remove when the GPX came from memory)
+            if gpx_xml is None:
+                _remove_temp_file(gpx_file_path)
+
+            return True
 
         except Exception as e:
             print(f"❌ Error during alternative FIT conversion: {e}")
             return False
 
-    def convert_gpx_to_tcx_format(self, gpx_file_path, output_path, has_timing=False):
-        """Convert GPX to TCX format using GPSBabel."""
-        try:
-            import subprocess
+    def convert_gpx_to_tcx_format(self, gpx_file_path, output_path, has_timing=False,
+                                  gpx_xml=None):
+        """
+        Convert GPX to TCX format using GPSBabel.
 
-            # Check if GPSBabel is available
-            try:
-                subprocess.run(['gpsbabel', '-V'], capture_output=True,
-                               check=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                print("GPSBabel not found. Please install it with: "
-                      "brew install gpsbabel")
+        When gpx_xml is given, GPSBabel reads it from stdin and gpx_file_path
+        only names the input in messages.
+        """
+        try:
+            # Check if GPSBabel is available (looked up once per instance)
+            if not self.find_gpsbabel():
                 return False
 
             if has_timing:
                 print(f"Converting to TCX activity format (with timing): {gpx_file_path.name}")
                 # For activities with timing, we should create a custom TCX
-                return self.create_garmin_activity_tcx(gpx_file_path, output_path)
+                return self.create_garmin_activity_tcx(gpx_file_path, output_path, gpx_xml)
             else:
                 print(f"Converting to TCX course format (route): {gpx_file_path.name}")
 
             # Convert to TCX format (course format for routes without timing)
-            cmd = [
-                'gpsbabel',
-                '-i', 'gpx',
-                '-f', str(gpx_file_path),
-                '-o', 'gtrnctr',  # Garmin Training Center TCX format
-                '-F', str(output_path)
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                if (os.path.exists(output_path) and
-                    os.path.getsize(output_path) > 0):
-                    print(f"✅ TCX file created: {output_path}")
-
-                    # Clean up temp file
-                    try:
-                        if os.path.exists(gpx_file_path):
-                            os.remove(gpx_file_path)
-                    except Exception:
-                        pass  # Silently ignore cleanup errors
-
-                    return True
-                else:
-                    print("❌ GPSBabel completed but no TCX file was created")
-                    return False
-            else:
-                print(f"❌ TCX conversion failed: {result.stderr}")
+            file_size, error = self._run_gpsbabel(gpx_file_path, output_path, 'gtrnctr',
+                                                  gpx_xml=gpx_xml)
+
+            if error is not None:
+                print(f"❌ TCX conversion failed: {error}")
                 return False
+            if not file_size:
+                print("❌ GPSBabel completed but no TCX file was created")
+                return False
+
+            print(f"✅ TCX file created: {output_path}")
+
+            # Clean up temp file (nothing to remove when the GPX came from memory)
+            if gpx_xml is None:
+                _remove_temp_file(gpx_file_path)
+
+            return True
 
         except Exception as e:
             print(f"❌ Error during TCX conversion: {e}")
@@ -1417,64 +1965,39 @@ class GPXScaler:
     def convert_original_gpx_to_tcx(self, gpx_file_path, output_path):
         """Convert original GPX to TCX format without modifications."""
         try:
-            import subprocess
-
-            # Check if GPSBabel is available
-            try:
-                subprocess.run(['gpsbabel', '-V'], capture_output=True,
-                               check=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                print("GPSBabel not found. Please install it with: "
-                      "brew install gpsbabel")
+            # Check if GPSBabel is available (looked up once per instance)
+            if not self.find_gpsbabel():
                 return False
 
             print(f"Converting original GPX to clean TCX: {gpx_file_path.name}")
 
             # Convert directly to TCX without any modifications
-            cmd = [
-                'gpsbabel',
-                '-i', 'gpx',
-                '-f', str(gpx_file_path),
-                '-o', 'gtrnctr',  # Garmin Training Center TCX format
-                '-F', str(output_path)
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            if result.returncode == 0:
-                if (os.path.exists(output_path) and
-                    os.path.getsize(output_path) > 0):
-                    print(f"✅ Clean TCX file created: {output_path}")
-
-                    # Verify content
-                    try:
-                        with open(gpx_file_path, 'r', encoding='utf-8') as f:
-                            gpx = gpxpy.parse(f)
-
-                        point_count = 0
-                        for track in gpx.tracks:
-                            for segment in track.segments:
-                                point_count += len(segment.points)
-                        for route in gpx.routes:
-                            point_count += len(route.points)
-
-                        if point_count > 0:
-                            print(f"   📊 Contains {point_count} points with "
-                                  "original coordinates and elevation")
-                            print("   🎯 No coordinate relocation - "
-                                  "maintains original geography")
-                            print("   📈 No elevation offset - "
-                                  "preserves original elevation profile")
-                    except Exception:
-                        print("   ✅ TCX file created successfully")
-
-                    return True
-                else:
-                    print("❌ GPSBabel completed but no TCX file was created")
-                    return False
-            else:
-                print(f"❌ TCX conversion failed: {result.stderr}")
+            file_size, error = self._run_gpsbabel(gpx_file_path, output_path, 'gtrnctr')
+
+            if error is not None:
+                print(f"❌ TCX conversion failed: {error}")
                 return False
+            if not file_size:
+                print("❌ GPSBabel completed but no TCX file was created")
+                return False
+
+            print(f"✅ Clean TCX file created: {output_path}")
+
+            # Verify content by streaming a point count of the original file
+            try:
+                point_count = count_gpx_points(gpx_file_path)
+
+                if point_count > 0:
+                    print(f"   📊 Contains {point_count} points with "
+                          "original coordinates and elevation")
+                    print("   🎯 No coordinate relocation - "
+                          "maintains original geography")
+                    print("   📈 No elevation offset - "
+                          "preserves original elevation profile")
+            except Exception:
+                print("   ✅ TCX file created successfully")
+
+            return True
 
         except Exception as e:
             print(f"❌ Error during clean TCX conversion: {e}")
@@ -1501,24 +2024,32 @@ class GPXScaler:
         else:
             folder_path = Path(".")
 
+        # Without GPSBabel every file would fail the same way
+        if not self.find_gpsbabel():
+            return False
+
         clean_tcx_folder = folder_path / "clean_tcx"
         clean_tcx_folder.mkdir(exist_ok=True)
 
-        success_count = 0
         total_files = len(self.gpx_files)
+        tcx_outputs = [clean_tcx_folder / f"{gpx_file.stem}_clean.tcx"
+                       for gpx_file in self.gpx_files]
 
         print(f"\nProcessing {total_files} GPX files...")
 
-        for i, gpx_file in enumerate(self.gpx_files, 1):
-            print(f"\n[{i}/{total_files}] Processing {gpx_file.name}...")
-
-            # Create output filename
-            tcx_output = clean_tcx_folder / f"{gpx_file.stem}_clean.tcx"
+        # Each conversion is a separate GPSBabel process, so threads are enough
+        # to keep several running at once
+        if total_files > 1:
+            with ThreadPoolExecutor(max_workers=min(total_files, os.cpu_count() or 1)) as executor:
+                results = list(executor.map(self.convert_original_gpx_to_tcx,
+                                            self.gpx_files, tcx_outputs))
+        else:
+            results = [self.convert_original_gpx_to_tcx(self.gpx_files[0], tcx_outputs[0])]
 
-            if self.convert_original_gpx_to_tcx(gpx_file, tcx_output):
-                success_count += 1
-            else:
+        for gpx_file, success in zip(self.gpx_files, results):
+            if not success:
                 print(f"❌ Failed to convert {gpx_file.name}")
+        success_count = sum(results)
 
         print("\n" + "="*80)
         print("CLEAN TCX CONVERSION COMPLETE")
@@ -1536,6 +2067,28 @@ class GPXScaler:
         return success_count > 0
 
 
+# Per-process state for the worker pools, set up once by _init_worker
+_worker_scaler = None
+_worker_scale_kwargs = None
+
+
+def _init_worker(scale_kwargs=None):
+    """Create one GPXScaler per worker process and keep the shared scaling options."""
+    global _worker_scaler, _worker_scale_kwargs
+    _worker_scaler = GPXScaler()
+    _worker_scale_kwargs = scale_kwargs
+
+
+def _analyze_file_worker(gpx_file):
+    """Analyze one GPX file in a worker process."""
+    return _worker_scaler.analyze_gpx_file(gpx_file)
+
+
+def _scale_file_worker(gpx_file):
+    """Scale one GPX file in a worker process with the pool's shared options."""
+    return _worker_scaler.scale_gpx_file(gpx_file, **_worker_scale_kwargs)
+
+
 def get_user_input():
     """Get user input for interactive mode."""
     # Get folder
@@ -1812,14 +2365,18 @@ def main():
     config = scaler.load_config()
 
     parser = argparse.ArgumentParser()
+    parser.add_argument('--folder', type=str, default='.', help='Folder containing the GPX files (default: current directory)')
     parser.add_argument('--file', type=str, help='Path to a single GPX file to scale')
     parser.add_argument('--scale', type=float, help='Distance scale factor (e.g., 0.5 for half, 2.0 for double)')
     parser.add_argument('--ascent-scale', type=float, help='Elevation/ascent scale factor (overrides max_ascent/min_distance logic)')
+    parser.add_argument('--min-distance', type=float, default=config["min_distance"], help='Minimum scaled distance in km per route')
+    parser.add_argument('--max-ascent', type=float, default=config["max_ascent"], help='Maximum scaled ascent in meters per route')
     parser.add_argument('--start-lat', type=float, help='Starting latitude for relocated route')
     parser.add_argument('--start-lon', type=float, help='Starting longitude for relocated route')
     parser.add_argument('--list-terrain', action='store_true', help='List available flat terrain coordinate options')
     parser.add_argument('--fit', action='store_true', help='Output FIT files instead of GPX')
     parser.add_argument('--tcx', action='store_true', help='Output TCX files instead of GPX')
+    parser.add_argument('--clean-tcx', action='store_true', help='Convert the original GPX files to TCX without scaling or relocation')
     parser.add_argument('--base-name', type=str, default=config["base_name"], help='Base name for output files and track names (e.g., "Stage" for Stage 1, Stage 2, etc.)')
 
     # Add timing-related arguments
@@ -1831,8 +2388,9 @@ def main():
 
 
     # Keep --ocean and --list-oceans for backwards compatibility
-    parser.add_argument('--terrain', type=int, choices=[1, 2, 3, 4, 5, 6], help='Choose a flat terrain coordinate set')
-    parser.add_argument('--ocean', type=int, choices=[1, 2, 3, 4, 5, 6], help='Alias for --terrain (backwards compatibility)')
+    terrain_choices = range(1, len(FLAT_TERRAIN_LOCATIONS) + 1)
+    parser.add_argument('--terrain', type=int, choices=terrain_choices, help='Choose a flat terrain coordinate set')
+    parser.add_argument('--ocean', type=int, choices=terrain_choices, help='Alias for --terrain (backwards compatibility)')
     parser.add_argument('--list-oceans', action='store_true', help='Alias for --list-terrain (backwards compatibility)')
 
     args = parser.parse_args()
@@ -1848,10 +2406,9 @@ def main():
 
     # Handle --list-terrain and --list-oceans flags (backwards compatibility)
     if args.list_terrain or args.list_oceans:
-        flat_locations = scaler.get_flat_terrain_coordinates()
         print("Available Flat Terrain Coordinates:")
         print("=" * 50)
-        for i, location in enumerate(flat_locations, 1):
+        for i, location in FLAT_TERRAIN_BY_NUMBER.items():
             print(f"{i}. {location['name']}")
             print(f"   Coordinates: {location['lat']:.1f}, {location['lon']:.1f}")
             print(f"   {location['description']}")
@@ -1870,16 +2427,12 @@ def main():
     start_lat_arg, start_lon_arg = args.start_lat, args.start_lon
     terrain_choice = args.terrain or args.ocean
     if terrain_choice:
-        flat_locations = scaler.get_flat_terrain_coordinates()
-        if 1 <= terrain_choice <= len(flat_locations):
-            selected = flat_locations[terrain_choice - 1]
-            start_lat_arg = selected['lat']
-            start_lon_arg = selected['lon']
-            print(f"Using flat terrain coordinates: {selected['name']}")
-            print(f"Coordinates: {start_lat_arg:.6f}, {start_lon_arg:.6f}")
-        else:
-            print(f"Error: Invalid terrain option {terrain_choice}. Use --list-terrain to see options.")
-            sys.exit(1)
+        # argparse has already rejected numbers outside the location list
+        selected = FLAT_TERRAIN_BY_NUMBER[terrain_choice]
+        start_lat_arg = selected['lat']
+        start_lon_arg = selected['lon']
+        print(f"Using flat terrain coordinates: {selected['name']}")
+        print(f"Coordinates: {start_lat_arg:.6f}, {start_lon_arg:.6f}")
 
     # Check if all required arguments are explicitly provided via command line
     # (not just config defaults) - only go to command line mode if user provided args
@@ -1935,7 +2488,8 @@ def main():
         if not scaler.find_gpx_files(args.folder):
             sys.exit(1)
 
-        scaler.analyze_all_files()
+        # Clean conversion needs no distance/ascent analysis; point counts for
+        # the summary are streamed per file by convert_original_gpx_to_tcx
         if scaler.convert_all_to_clean_tcx():
             sys.exit(0)
         else:
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import math
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import gpxpy
+import gpxpy.gpx
+import requests
+
+import debug_elevation
+import gpxscaler
+from gpxscaler import EQUIRECTANGULAR_MAX_STEP, GPXScaler, gpx_to_xml
+
+# Track- and route-level Garmin extensions need the document's namespace map
+EXTENSIONS_GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxx="http://www.garmin.com/xmlschemas/GpxExtensions/v3">
+  <rte>
+    <name>Route</name>
+    <extensions><gpxx:RouteExtension><gpxx:DisplayColor>Red</gpxx:DisplayColor></gpxx:RouteExtension></extensions>
+    <rtept lat="46.1" lon="7.1"><ele>500</ele></rtept>
+    <rtept lat="46.2" lon="7.2"><ele>510</ele></rtept>
+  </rte>
+  <trk>
+    <name>Track</name>
+    <extensions><gpxx:TrackExtension><gpxx:DisplayColor>Blue</gpxx:DisplayColor></gpxx:TrackExtension></extensions>
+    <trkseg>
+      <trkpt lat="46.1" lon="7.1"><ele>500</ele></trkpt>
+      <trkpt lat="46.2" lon="7.2"><ele>510</ele></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+
+class GpxToXmlTest(unittest.TestCase):
+    def test_matches_gpxpy_with_track_and_route_extensions(self):
+        gpx = gpxpy.parse(EXTENSIONS_GPX)
+        xml = gpx_to_xml(gpx)
+        self.assertEqual(xml, gpx.to_xml())
+        # The output must also parse back
+        gpxpy.parse(xml)
+
+
+class EquirectangularDistanceTest(unittest.TestCase):
+    def test_short_steps_stay_within_bound_of_haversine(self):
+        scaler = GPXScaler()
+        # Steps just under the limit, from due north to due east, up to near the pole
+        max_step = math.degrees(EQUIRECTANGULAR_MAX_STEP) * 0.999
+        for latitude in (0, 45, 70, 85, 89.9):
+            for fraction in (0, 0.25, 0.5, 0.75, 1):
+                lat2 = latitude - max_step * fraction
+                lon2 = max_step * (1 - fraction)
+                distance, = scaler.calculate_coordinate_distances([latitude, lat2], [0, lon2])
+                haversine = scaler.calculate_coordinate_distance(latitude, 0, lat2, lon2)
+                self.assertLess(abs(distance - haversine), 0.00015)
+
+
+# Two track segments, a route, a point without <ele> and namespaced extensions
+ANALYSIS_GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">
+  <trk>
+    <name>Track</name>
+    <trkseg>
+      <trkpt lat="46.1000" lon="7.1000"><ele>500.0</ele></trkpt>
+      <trkpt lat="46.1010" lon="7.1015"><ele>504.5</ele>
+        <extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>120</gpxtpx:hr></gpxtpx:TrackPointExtension></extensions>
+      </trkpt>
+      <trkpt lat="46.1025" lon="7.1020"><ele>503.0</ele></trkpt>
+      <trkpt lat="46.1040" lon="7.1041"><ele>511.2</ele></trkpt>
+      <trkpt lat="46.1052" lon="7.1060"><ele>509.9</ele></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="46.2000" lon="7.2000"><ele>600.0</ele></trkpt>
+      <trkpt lat="46.2012" lon="7.2011"></trkpt>
+      <trkpt lat="46.2030" lon="7.2018"><ele>590.5</ele></trkpt>
+      <trkpt lat="46.2041" lon="7.2035"><ele>597.0</ele></trkpt>
+    </trkseg>
+  </trk>
+  <rte>
+    <name>Route</name>
+    <rtept lat="46.3000" lon="7.3000"><ele>700.0</ele></rtept>
+    <rtept lat="46.3020" lon="7.3010"><ele>706.0</ele></rtept>
+    <rtept lat="46.3030" lon="7.3040"></rtept>
+    <rtept lat="46.3500" lon="7.3600"><ele>690.0</ele></rtept>
+    <rtept lat="46.3510" lon="7.3620"><ele>695.5</ele></rtept>
+  </rte>
+</gpx>
+"""
+
+
+class AnalyzeGpxFileTest(unittest.TestCase):
+    def test_streamed_analysis_matches_gpxpy(self):
+        scaler = GPXScaler()
+        gpx = gpxpy.parse(ANALYSIS_GPX)
+
+        # The gpxpy-based analysis: built-in track methods, Haversine and raw
+        # elevation changes for routes
+        distance = ascent = descent = 0
+        for track in gpx.tracks:
+            for segment in track.segments:
+                distance += segment.length_2d()
+                uphill, downhill = segment.get_uphill_downhill()
+                ascent += uphill
+                descent += downhill
+        for route in gpx.routes:
+            for prev, cur in zip(route.points, route.points[1:]):
+                distance += scaler.calculate_distance(prev, cur)
+                if prev.elevation is not None and cur.elevation is not None:
+                    change = cur.elevation - prev.elevation
+                    ascent += max(change, 0)
+                    descent += max(-change, 0)
+
+        with tempfile.TemporaryDirectory() as folder:
+            gpx_file = Path(folder) / "analysis.gpx"
+            gpx_file.write_text(ANALYSIS_GPX)
+            stats = scaler.analyze_gpx_file(gpx_file)
+
+        # Short route steps use the equirectangular distance, well under 1mm off
+        self.assertAlmostEqual(stats['distance_km'], distance / 1000, places=6)
+        self.assertAlmostEqual(stats['ascent_m'], ascent, places=9)
+        self.assertAlmostEqual(stats['descent_m'], descent, places=9)
+
+
+class ScaleSegmentPointsTest(unittest.TestCase):
+    # Maximum distance (meters) between a scaled point and the per-point geodesic result
+    POSITION_TOLERANCE = 0.05
+
+    def make_segment(self, scaler):
+        """800 winding track points with times, 15-40m apart, a few without elevation."""
+        points = []
+        lat, lon = 60.0, 10.0
+        start_time = datetime(2024, 6, 1, 8)
+        for i in range(800):
+            elevation = None if i % 97 == 5 else 300 + 40 * math.sin(i / 37)
+            points.append(gpxpy.gpx.GPXTrackPoint(lat, lon, elevation=elevation,
+                                                  time=start_time + timedelta(seconds=5 * i)))
+            lat, lon = scaler.calculate_destination_point(
+                lat, lon, 1.2 * math.sin(i / 50) + 0.3, 15 + 25 * abs(math.sin(i / 11)))
+        return points
+
+    def geodesic_scaling(self, scaler, points, start_lat, start_lon, base_elevation,
+                         distance_scale, elevation_scale):
+        """The original per-point scaling: Haversine, bearing and destination for every step."""
+        scaled = [(start_lat, start_lon, base_elevation)]
+        for prev, cur in zip(points, points[1:]):
+            prev_lat, prev_lon, prev_elevation = scaled[-1]
+            lat, lon = scaler.calculate_destination_point(
+                prev_lat, prev_lon, scaler.calculate_bearing(prev, cur),
+                scaler.calculate_distance(prev, cur) * distance_scale)
+            if prev.elevation is not None and cur.elevation is not None:
+                elevation = prev_elevation + (cur.elevation - prev.elevation) * elevation_scale
+            else:
+                elevation = prev_elevation
+            scaled.append((lat, lon, elevation))
+        return scaled
+
+    def test_matches_geodesic_scaling(self):
+        scaler = GPXScaler()
+        for start_lat in (52.5, 70.0):
+            for distance_scale in (0.5, 2.0, 37):
+                with self.subTest(start_lat=start_lat, distance_scale=distance_scale):
+                    points = self.make_segment(scaler)
+                    times = [point.time for point in points]
+                    expected = self.geodesic_scaling(scaler, points, start_lat, 4.0, 10.0,
+                                                     distance_scale, 0.7)
+
+                    scaler.scale_segment_points(points, start_lat, 4.0, 10.0, distance_scale, 0.7)
+
+                    deviation = max(scaler.calculate_coordinate_distance(
+                                        lat, lon, point.latitude, point.longitude)
+                                    for (lat, lon, _), point in zip(expected, points))
+                    self.assertLess(deviation, self.POSITION_TOLERANCE)
+                    self.assertEqual([point.elevation for point in points],
+                                     [elevation for _, _, elevation in expected])
+                    self.assertEqual([point.time for point in points], times)
+
+
+def json_response(data, status_code=200):
+    """Build a requests response with a JSON body, as the session would return."""
+    response = requests.models.Response()
+    response.status_code = status_code
+    response._content = json.dumps(data).encode('utf-8')
+    return response
+
+
+class GetElevationsTest(unittest.TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_file = Path(cache_dir.name) / "elevation_cache.json"
+        patcher = mock.patch.object(gpxscaler, 'ELEVATION_CACHE_FILE', self.cache_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.scaler = GPXScaler()
+        self.scaler.session.post = mock.Mock()
+        self.scaler.fetch_elevation = mock.Mock(return_value=None)
+
+    def test_batch_results_in_input_order_and_cached(self):
+        self.scaler.session.post.return_value = json_response(
+            {'results': [{'elevation': 10.0}, {'elevation': 20.0}, {'elevation': 30.0}]})
+        coordinates = [(46.1, 7.1), (46.2, 7.2), (46.3, 7.3)]
+
+        self.assertEqual(self.scaler.get_elevations(coordinates), [10.0, 20.0, 30.0])
+        self.scaler.session.post.assert_called_once()
+        self.assertEqual(self.scaler.session.post.call_args.args[0],
+                         gpxscaler.OPEN_ELEVATION_LOOKUP_URL)
+        self.scaler.fetch_elevation.assert_not_called()
+        self.assertEqual(json.loads(self.cache_file.read_text()),
+                         {'46.100,7.100': 10.0, '46.200,7.200': 20.0, '46.300,7.300': 30.0})
+
+        # Reversed order comes back reversed, straight from the cache
+        self.assertEqual(self.scaler.get_elevations(coordinates[::-1]), [30.0, 20.0, 10.0])
+        self.scaler.session.post.assert_called_once()
+
+    def test_only_uncached_coordinates_are_posted(self):
+        self.scaler.load_elevation_cache()['46.100,7.100'] = 10.0
+        self.scaler.session.post.return_value = json_response({'results': [{'elevation': 20.0}]})
+
+        self.assertEqual(self.scaler.get_elevations([(46.1, 7.1), (46.2, 7.2)]), [10.0, 20.0])
+        posted = self.scaler.session.post.call_args.kwargs['json']['locations']
+        self.assertEqual(posted, [{'latitude': 46.2, 'longitude': 7.2}])
+
+    def test_short_or_incomplete_batch_falls_back_per_point(self):
+        # Three posted, two returned and one of those without an elevation
+        self.scaler.session.post.return_value = json_response(
+            {'results': [{'elevation': 10.0}, {'elevation': None}]})
+        self.scaler.fetch_elevation.side_effect = lambda lat, lon: {46.2: 25.0, 46.3: 35.0}[lat]
+
+        self.assertEqual(self.scaler.get_elevations([(46.1, 7.1), (46.2, 7.2), (46.3, 7.3)]),
+                         [10.0, 25.0, 35.0])
+        self.assertEqual(self.scaler.fetch_elevation.call_args_list,
+                         [mock.call(46.2, 7.2), mock.call(46.3, 7.3)])
+
+    def test_failed_batch_falls_back_per_point_with_none_for_unknown(self):
+        self.scaler.session.post.side_effect = requests.ConnectionError("offline")
+        self.scaler.fetch_elevation.side_effect = lambda lat, lon: 15.0 if lat == 46.1 else None
+
+        self.assertEqual(self.scaler.get_elevations([(46.1, 7.1), (46.2, 7.2)]), [15.0, None])
+        self.assertEqual(self.scaler.fetch_elevation.call_count, 2)
+        # Unknown elevations are not cached, so they are asked for again next time
+        self.assertEqual(json.loads(self.cache_file.read_text()), {'46.100,7.100': 15.0})
+
+
+class CacheTestCase(unittest.TestCase):
+    """Runs each test against a temporary cache directory and GPX file."""
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.cache_dir = Path(folder.name) / "cache"
+        self.gpx_file = Path(folder.name) / "stage-1-route.gpx"
+        self.write_gpx(ANALYSIS_GPX)
+
+    def patch(self, target, attribute, value):
+        patcher = mock.patch.object(target, attribute, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_gpx(self, content):
+        """Rewrite the GPX file with a strictly newer mtime, as an edit would."""
+        previous_mtime_ns = self.gpx_file.stat().st_mtime_ns if self.gpx_file.exists() else 0
+        self.gpx_file.write_text(content)
+        mtime_ns = max(self.gpx_file.stat().st_mtime_ns, previous_mtime_ns + 1)
+        os.utime(self.gpx_file, ns=(mtime_ns, mtime_ns))
+
+
+class RouteStatsCacheTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_file = self.cache_dir / "route_stats.pkl"
+        self.patch(gpxscaler, 'ROUTE_STATS_CACHE_FILE', self.cache_file)
+
+    def analyze(self):
+        """Run analyze_all_files on a fresh scaler; return (route stats, files analyzed)."""
+        scaler = GPXScaler()
+        scaler.gpx_files = [self.gpx_file]
+        with mock.patch.object(GPXScaler, 'analyze_gpx_file', autospec=True,
+                               side_effect=GPXScaler.analyze_gpx_file) as analyze_gpx_file, \
+                contextlib.redirect_stdout(io.StringIO()):
+            scaler.analyze_all_files()
+        return scaler.route_stats[self.gpx_file], analyze_gpx_file.call_count
+
+    def test_unchanged_file_is_read_from_cache(self):
+        stats, analyzed = self.analyze()
+        self.assertEqual(analyzed, 1)
+        self.assertEqual(self.analyze(), (stats, 0))
+
+    def test_rewritten_file_is_analyzed_again(self):
+        stats, _ = self.analyze()
+        self.write_gpx(EXTENSIONS_GPX)
+        new_stats, analyzed = self.analyze()
+        self.assertEqual(analyzed, 1)
+        self.assertNotEqual(new_stats, stats)
+        # Only the entry for the current version of the file is kept
+        with open(self.cache_file, 'rb') as f:
+            self.assertEqual(list(pickle.load(f).values()), [new_stats])
+
+    def test_unreadable_cache_is_replaced(self):
+        self.cache_dir.mkdir()
+        self.cache_file.write_bytes(b"not a pickle")
+        stats, analyzed = self.analyze()
+        self.assertEqual(analyzed, 1)
+        self.assertEqual(self.analyze(), (stats, 0))
+
+
+class DebugElevationCacheTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.patch(debug_elevation, 'CACHE_DIR', self.cache_dir)
+
+    def analyze(self):
+        """Run analyze_file; return (data, whether the file was parsed)."""
+        with mock.patch.object(debug_elevation, '_analyze_file',
+                               side_effect=debug_elevation._analyze_file) as analyze_file:
+            data = debug_elevation.analyze_file(self.gpx_file)
+        return data, analyze_file.called
+
+    def test_unchanged_file_is_read_from_cache(self):
+        data, parsed = self.analyze()
+        self.assertTrue(parsed)
+        self.assertEqual(self.analyze(), (data, False))
+
+    def test_rewritten_file_is_analyzed_again(self):
+        data, _ = self.analyze()
+        self.write_gpx(EXTENSIONS_GPX)
+        new_data, parsed = self.analyze()
+        self.assertTrue(parsed)
+        self.assertNotEqual(new_data['elevations'], data['elevations'])
+        # The entry for the previous version of the file is deleted
+        self.assertEqual(len(list(self.cache_dir.glob("*.pkl"))), 1)
+
+    def test_unreadable_cache_is_replaced(self):
+        data, _ = self.analyze()
+        cache_file, = self.cache_dir.glob("*.pkl")
+        cache_file.write_bytes(b"not a pickle")
+        self.assertEqual(self.analyze(), (data, True))
+        self.assertEqual(self.analyze(), (data, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
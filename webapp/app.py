@@ -61,11 +61,10 @@ class WebGPXHandler:
         # Process tracks
         for track in gpx.tracks:
             for segment in track.segments:
-                prev_point = None
-                for point in segment.points:
-                    if prev_point:
-                        distance = self.scaler.calculate_distance(prev_point, point)
-                        cumulative_distance += distance
+                # Step distances for the whole segment in one pass; the first point adds none
+                step_distances = [0] + self.scaler.calculate_segment_distances(segment.points)
+                for point, distance in zip(segment.points, step_distances):
+                    cumulative_distance += distance
 
                     points.append({
                         'lat': point.latitude,
@@ -74,16 +73,14 @@ class WebGPXHandler:
                     })
                     elevations.append(point.elevation if point.elevation else 0)
                     distances.append(cumulative_distance / 1000)  # Convert to km
-                    prev_point = point
 
         # Process routes if no tracks
         if not points:
             for route in gpx.routes:
-                prev_point = None
-                for point in route.points:
-                    if prev_point:
-                        distance = self.scaler.calculate_distance(prev_point, point)
-                        cumulative_distance += distance
+                # Step distances for the whole route in one pass; the first point adds none
+                step_distances = [0] + self.scaler.calculate_segment_distances(route.points)
+                for point, distance in zip(route.points, step_distances):
+                    cumulative_distance += distance
 
                     points.append({
                         'lat': point.latitude,
@@ -92,7 +89,6 @@ class WebGPXHandler:
                     })
                     elevations.append(point.elevation if point.elevation else 0)
                     distances.append(cumulative_distance / 1000)  # Convert to km
-                    prev_point = point
 
         return {
             'points': points,
@@ -106,9 +102,9 @@ class WebGPXHandler:
     def calculate_total_ascent(self, elevations):
         """Calculate total ascent from elevation profile."""
         total_ascent = 0
-        for i in range(1, len(elevations)):
-            if elevations[i] > elevations[i-1]:
-                total_ascent += elevations[i] - elevations[i-1]
+        for prev, cur in zip(elevations, elevations[1:]):
+            if cur > prev:
+                total_ascent += cur - prev
         return total_ascent
 
     def calculate_bounds(self, points):
@@ -141,11 +137,9 @@ class WebGPXHandler:
         })
 
         # Scale subsequent points
-        for i in range(1, len(points)):
+        for prev_orig, curr_orig in zip(points, points[1:]):
             # Calculate original bearing and distance from previous point
-            prev_orig = points[i-1]
-            curr_orig = points[i]
-            prev_scaled = scaled_points[i-1]
+            prev_scaled = scaled_points[-1]
 
             # Simple scaling (more sophisticated scaling would use the GPXScaler methods)
             lat_diff = (curr_orig['lat'] - prev_orig['lat']) * distance_scale
@@ -3,6 +3,7 @@ GPX Integration utilities for the web application.
 This module provides a bridge between the web interface and the existing GPXScaler class.
 """
 
+import io
 import sys
 from pathlib import Path
 import tempfile
@@ -12,8 +13,7 @@ import os
 parent_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(parent_dir))
 
-from gpxscaler import GPXScaler
-import gpxpy
+from gpxscaler import GPXScaler, iter_gpx_segments
 
 
 class WebGPXIntegration:
@@ -108,48 +108,35 @@ class WebGPXIntegration:
             dict: Route data including points, elevations, distances, stats
         """
         try:
-            gpx = gpxpy.parse(gpx_content)
+            # Stream the coordinates; the preview never needs gpxpy objects
+            segments = {'track': [], 'route': []}
+            for kind, latitudes, longitudes, point_elevations in iter_gpx_segments(
+                    io.StringIO(gpx_content), missing=0):
+                segments[kind].append((latitudes, longitudes, point_elevations))
+
+            # Use tracks first, routes if no track points were found
+            if not any(latitudes for latitudes, _, _ in segments['track']):
+                segments['track'] = segments['route']
 
             points = []
             elevations = []
             distances = []
             cumulative_distance = 0
 
-            # Process tracks first
-            for track in gpx.tracks:
-                for segment in track.segments:
-                    prev_point = None
-                    for point in segment.points:
-                        if prev_point:
-                            distance = self.scaler.calculate_distance(prev_point, point)
-                            cumulative_distance += distance
-
-                        points.append({
-                            'lat': point.latitude,
-                            'lon': point.longitude,
-                            'ele': point.elevation if point.elevation else 0
-                        })
-                        elevations.append(point.elevation if point.elevation else 0)
-                        distances.append(cumulative_distance / 1000)  # Convert to km
-                        prev_point = point
-
-            # Process routes if no tracks found
-            if not points:
-                for route in gpx.routes:
-                    prev_point = None
-                    for point in route.points:
-                        if prev_point:
-                            distance = self.scaler.calculate_distance(prev_point, point)
-                            cumulative_distance += distance
-
-                        points.append({
-                            'lat': point.latitude,
-                            'lon': point.longitude,
-                            'ele': point.elevation if point.elevation else 0
-                        })
-                        elevations.append(point.elevation if point.elevation else 0)
-                        distances.append(cumulative_distance / 1000)  # Convert to km
-                        prev_point = point
+            for latitudes, longitudes, point_elevations in segments['track']:
+                # Step distances for the whole segment in one pass; the first point adds none
+                step_distances = [0] + self.scaler.calculate_coordinate_distances(latitudes, longitudes)
+                for lat, lon, ele, distance in zip(latitudes, longitudes, point_elevations,
+                                                   step_distances):
+                    cumulative_distance += distance
+
+                    points.append({
+                        'lat': lat,
+                        'lon': lon,
+                        'ele': ele
+                    })
+                    elevations.append(ele)
+                    distances.append(cumulative_distance / 1000)  # Convert to km
 
             # Calculate statistics
             total_ascent = self._calculate_total_ascent(elevations)
@@ -212,9 +199,9 @@ class WebGPXIntegration:
     def _calculate_total_ascent(self, elevations):
         """Calculate total ascent from elevation profile."""
         total_ascent = 0
-        for i in range(1, len(elevations)):
-            if elevations[i] > elevations[i-1]:
-                total_ascent += elevations[i] - elevations[i-1]
+        for prev, cur in zip(elevations, elevations[1:]):
+            if cur > prev:
+                total_ascent += cur - prev
         return total_ascent
 
     def _calculate_bounds(self, points):
@@ -249,10 +236,8 @@ class WebGPXIntegration:
         })
 
         # Scale subsequent points
-        for i in range(1, len(points)):
-            prev_orig = points[i-1]
-            curr_orig = points[i]
-            prev_scaled = scaled_points[i-1]
+        for prev_orig, curr_orig in zip(points, points[1:]):
+            prev_scaled = scaled_points[-1]
 
             # Simple scaling (more sophisticated scaling would use the GPXScaler methods)
             lat_diff = (curr_orig['lat'] - prev_orig['lat']) * distance_scale